@@ -0,0 +1,299 @@
+"""Benchmarks of the RTDE client hot path for the portmark.xml recipes.
+
+Runs offline: RTDE.receive/receive_batch/send talk to a loopback stand-in
+(mock_robot.py) that replays a canned stream of state packages, the rest works
+on canned bytes. For each path it reports packets/s, per packet latency
+percentiles, transient bytes allocated per packet (tracemalloc peak, CPython has
+no allocation counter) and CPU ms per 1k packets. RTDE.mark+flush x5 counts
+the five input packages of a coalesced write as five packets. Run from the repository root:
+
+    python benchmarks/rtde_benchmark.py                # report
+    python benchmarks/rtde_benchmark.py --save         # store as the baseline
+    python benchmarks/rtde_benchmark.py --check        # compare with the baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import mock_robot
+import rtde.rtde as rtde
+import rtde.rtde_config as rtde_config
+from rtde import serialize
+from portmark import UR10_RTDE
+
+CONFIG_FILE = os.path.join(ROOT, 'portmark.xml')
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# packets/s may drop and CPU may grow by this fraction before --check fails
+TOLERANCE = 0.25
+
+
+class CannedSession(mock_robot.Session):
+    """Answers the setup handshake, then replays server.canned on start, server.burst packets
+    per write, and ignores input packages"""
+    def on_command(self, command, payload):
+        if command == rtde.Command.RTDE_DATA_PACKAGE:
+            return
+        super().on_command(command, payload)
+
+    def stream(self):
+        canned = memoryview(self.server.canned)
+        chunk = self.server.burst * self.server.packet_size
+        for start in range(0, len(canned), chunk):
+            if not self.streaming.is_set():
+                return
+            self.conn.sendall(canned[start:start + chunk])
+
+
+class CannedServer(mock_robot.RTDEServer):
+    session_class = CannedSession
+
+    def __init__(self, canned: bytes = b'', packet_size: int = 1, burst: int = 1):
+        super().__init__(port=0)
+        self.canned = canned
+        self.packet_size = packet_size
+        self.burst = burst
+
+
+def make_config(recipe_id, names, types):
+    config = serialize.DataConfig.unpack_recipe(bytes([recipe_id]) + ','.join(types).encode('utf-8'))
+    config.names = names
+    return config
+
+
+def make_states(config, count):
+    """count state payloads, registers constant and vectors varying like a moving robot"""
+    payloads = []
+    for i in range(count):
+        values = [config.id, 0, False, False, False, False, False, True] + [i * 1e-4] * 24
+        payloads.append(config.struct.pack(*values))
+    return payloads
+
+
+def measure(fn, count, latency=True):
+    """Calls fn(i) until count packets are handled, fn returns the packets it handled in the call.
+    Stops early when a call handles nothing (stream exhausted)"""
+    times = []
+    packets = 0
+    i = 0
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    while packets < count:
+        start = time.perf_counter()
+        handled = fn(i)
+        if not handled:
+            break
+        if latency:
+            times.append((time.perf_counter() - start) / handled)
+        packets += handled
+        i += 1
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+
+    result = {
+        'packets_per_s': packets / wall,
+        'cpu_ms_per_1k': 1000 * cpu / packets * 1000,
+    }
+    if latency:
+        # latency of a call spread over the packets it handled
+        times.sort()
+        for p in (50, 90, 99):
+            result['p%d_us' % p] = 1e6 * times[min(len(times) - 1, len(times) * p // 100)]
+    return result
+
+
+def allocations(fn, calls=200):
+    """Median transient bytes allocated per packet (tracemalloc peak) over a short traced run"""
+    tracemalloc.start()
+    peaks = []
+    for i in range(calls):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        handled = fn(i)
+        if not handled:
+            break
+        peaks.append((tracemalloc.get_traced_memory()[1] - current) / handled)
+    tracemalloc.stop()
+    return sorted(peaks)[len(peaks) // 2] if peaks else 0.0
+
+
+def benchmark(fn, count, latency=True):
+    result = measure(fn, count, latency)
+    result['bytes_per_packet'] = allocations(fn)
+    return result
+
+
+def bench_serialize(conf, count):
+    state = make_config(1, *conf.get_recipe('state'))
+    payloads = make_states(state, count)
+    positions = make_config(2, *conf.get_recipe('positions'))
+    inputs = positions.unpack(positions.struct.pack(2, *range(6)))
+    reused = state.unpack(payloads[0])
+    return {
+        'DataConfig.unpack': benchmark(lambda i: state.unpack(payloads[i % count]) and 1, count),
+        'DataConfig.unpack reuse': benchmark(lambda i: state.unpack(payloads[i % count], 0, reused) and 1, count),
+        'DataConfig.pack': benchmark(lambda i: positions.pack(inputs) and 1, count),
+    }
+
+
+def bench_state_setter(conf, count):
+    state = make_config(1, *conf.get_recipe('state'))
+    objects = [state.unpack(p) for p in make_states(state, count)]
+    robo = object.__new__(UR10_RTDE)  # no connection needed for the setter
+    robo.name = None
+
+    def setter(i):
+        robo.state = objects[i % count]
+        return 1
+    with contextlib.redirect_stdout(io.StringIO()):
+        return {'UR10_RTDE.state setter': benchmark(setter, count)}
+
+
+def stream_benchmark(conf, make_fn, count, latency=True, *server_args):
+    """Times fn = make_fn(con) on one connection, then traces allocations on a fresh one"""
+    result = None
+    for _ in range(2):
+        server = CannedServer(*server_args).start()
+        con = rtde.RTDE('127.0.0.1', server.port)
+        try:
+            con.connect()
+            con.send_output_setup(*conf.get_recipe('state'))
+            fn = make_fn(con)
+            if result is None:
+                result = measure(fn, count, latency)
+            else:
+                result['bytes_per_packet'] = allocations(fn)
+        finally:
+            con.disconnect()
+            server.stop()
+    return result
+
+
+def make_receive(con):
+    # every package through receive(), lossless so none are skipped
+    con.send_start()
+    con.start_recording()
+
+    def receive(i):
+        before = con.received_package_count
+        con.receive()
+        con.take_recorded()
+        return con.received_package_count - before
+    return receive
+
+
+def make_receive_batch(con):
+    con.send_start()
+
+    def receive_batch(i):
+        batch = con.receive_batch()
+        return 0 if batch is None else len(batch)
+    return receive_batch
+
+
+def make_send(con, conf):
+    positions = con.send_input_setup(*conf.get_recipe('positions'))
+    for name in positions.__slots__[1:]:
+        setattr(positions, name, 0.0)
+    con.send_start()
+    return lambda i: con.send(positions) and 1
+
+
+def make_send_unchanged(con, conf):
+    """Sends of unchanged values, all suppressed but the first"""
+    con.suppress_unchanged()
+    return make_send(con, conf)
+
+
+def make_flush(con, conf):
+    """A dispatch: the five input recipes of portmark.xml marked and flushed in one write"""
+    inputs = []
+    for key in ('gantry', 'internal', 'home', 'control', 'positions'):
+        recipe = con.send_input_setup(*conf.get_recipe(key))
+        for name in recipe.__slots__[1:]:
+            setattr(recipe, name, 0)
+        inputs.append(recipe)
+    con.send_start()
+
+    def flush(i):
+        for recipe in inputs:
+            con.mark(recipe)
+        return con.flush() and len(inputs)
+    return flush
+
+
+def bench_connection(conf, count):
+    state = make_config(1, *conf.get_recipe('state'))
+    header = serialize.HEADER.pack(state.struct.size + 3, rtde.Command.RTDE_DATA_PACKAGE)
+    packet_size = len(header) + state.struct.size
+    canned = b''.join(header + p for p in make_states(state, count))
+    return {
+        'RTDE.receive recording': stream_benchmark(conf, make_receive, count, True, canned, packet_size, 1),
+        # as if the controller had a backlog of 64 packages on every read
+        'RTDE.receive_batch': stream_benchmark(conf, make_receive_batch, count, False, canned, packet_size, 64),
+        'RTDE.send': stream_benchmark(conf, lambda con: make_send(con, conf), count),
+        'RTDE.mark+flush x5': stream_benchmark(conf, lambda con: make_flush(con, conf), count),
+        'RTDE.send unchanged': stream_benchmark(conf, lambda con: make_send_unchanged(con, conf), count),
+    }
+
+
+def run(count):
+    conf = rtde_config.ConfigFile(CONFIG_FILE)
+    results = {}
+    results.update(bench_serialize(conf, count))
+    results.update(bench_state_setter(conf, count))
+    results.update(bench_connection(conf, count))
+    return results
+
+
+def report(results, baseline=None, tolerance=TOLERANCE):
+    columns = ['packets_per_s', 'p50_us', 'p90_us', 'p99_us', 'bytes_per_packet', 'cpu_ms_per_1k']
+    print('%-26s' % 'benchmark' + ''.join('%18s' % c for c in columns))
+    regressions = []
+    for name, result in results.items():
+        print('%-26s' % name + ''.join('%18.2f' % result[c] if c in result else '%18s' % '-' for c in columns))
+        if baseline and name in baseline:
+            before = baseline[name]
+            if result['packets_per_s'] < before['packets_per_s'] * (1 - tolerance):
+                regressions.append('%s: %.0f packets/s, baseline %.0f' % (name, result['packets_per_s'], before['packets_per_s']))
+            if result['cpu_ms_per_1k'] > before['cpu_ms_per_1k'] * (1 + tolerance):
+                regressions.append('%s: %.2f CPU ms/1k, baseline %.2f' % (name, result['cpu_ms_per_1k'], before['cpu_ms_per_1k']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RTDE client hot path benchmarks")
+    parser.add_argument('--packets', type=int, default=20000)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--check', action='store_true', help='exit non zero when slower than the baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='allowed fraction slower than the baseline')
+    args = parser.parse_args()
+
+    results = run(args.packets)
+    baseline = None
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = report(results, baseline, args.tolerance)
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print('Saved baseline to ' + args.baseline)
+    if regressions:
+        print('REGRESSIONS:')
+        for r in regressions:
+            print('  ' + r)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Microbenchmark of DataConfig pack/unpack for the portmark.xml recipes.
+
+Compares the compiled struct/field plan path and generated recipe classes
+against the previous path, which re-parsed the format string on every call and
+walked the fields of a dict based DataObject through serialize.unpack_field. Run from the repository root:
+
+    python benchmarks/serialize_benchmark.py
+"""
+import os
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from rtde import serialize
+import rtde.rtde_config as rtde_config
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'portmark.xml')
+
+
+def make_config(recipe_id, names, types):
+    """Builds a DataConfig the same way RTDE does from a setup reply"""
+    config = serialize.DataConfig.unpack_recipe(bytes([recipe_id]) + ','.join(types).encode('utf-8'))
+    config.names = names
+    return config
+
+
+def make_payload(config):
+    """A data package payload (recipe id + fields) with distinct values per field"""
+    values = [config.id]
+    for i, code in enumerate(config.fmt[2:]):
+        values.append(bool(i % 2) if code == '?' else i)
+    return config.struct.pack(*values)
+
+
+def legacy_unpack(config, data):
+    li = struct.unpack_from(config.fmt, data)
+    return serialize.DataObject.unpack(li, config.names, config.types)
+
+
+def legacy_pack(config, state):
+    return struct.pack(config.fmt, *state.pack(config.names, config.types))
+
+
+def report(label, seconds, number):
+    print('%-32s %8.2f us/call %10.0f calls/s' % (label, 1e6 * seconds / number, number / seconds))
+
+
+def main(number=100000):
+    conf = rtde_config.ConfigFile(CONFIG_FILE)
+
+    state = make_config(1, *conf.get_recipe('state'))
+    payload = make_payload(state)
+    legacy = legacy_unpack(state, payload)
+    assert all(getattr(legacy, name) == getattr(state.unpack(payload), name) for name in state.names)
+    reused = state.unpack(payload)
+
+    positions = make_config(2, *conf.get_recipe('positions'))
+    inputs = positions.unpack(make_payload(positions))
+    legacy_inputs = legacy_unpack(positions, make_payload(positions))
+    assert legacy_pack(positions, legacy_inputs) == positions.pack(inputs)
+
+    print('state recipe: %d fields, %d bytes' % (len(state.names), len(payload)))
+    report('unpack state (legacy)', min(timeit.repeat(lambda: legacy_unpack(state, payload), number=number, repeat=3)), number)
+    report('unpack state (compiled)', min(timeit.repeat(lambda: state.unpack(payload), number=number, repeat=3)), number)
+    report('unpack state (reused object)', min(timeit.repeat(lambda: state.unpack(payload, 0, reused), number=number, repeat=3)), number)
+    report('pack positions (legacy)', min(timeit.repeat(lambda: legacy_pack(positions, legacy_inputs), number=number, repeat=3)), number)
+    report('pack positions (compiled)', min(timeit.repeat(lambda: positions.pack(inputs), number=number, repeat=3)), number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Offline cycle time estimates for portmark task lists.
+
+Replays a task list (see portmark.stack_tasks) against a simple model of the
+UR10 moves instead of a robot: rest to rest trapezoidal velocity profiles for
+travel, approach and print moves, a fixed gantry swap time and a handshake
+overhead per task. Positions are in the carton frame of generate_coords, in metres.
+The defaults are rough, calibrate them against the "Cycle time is ..." of a real run.
+"""
+import argparse
+import math
+import time
+from portmark import cartons_enum, stack_tasks
+
+
+def move_time(distance: float, speed: float, accel: float):
+    """Seconds for a rest to rest move, trapezoidal velocity profile (triangular when too short to reach speed)"""
+    if distance <= 0:
+        return 0.0
+    if distance < speed * speed / accel:
+        return 2 * math.sqrt(distance / accel)
+    return distance / speed + speed / accel
+
+
+class MotionModel():
+    """Move parameters of the robot, SI units"""
+    def __init__(self, travel_speed: float = 1.0, travel_accel: float = 1.2,
+                 approach_speed: float = 0.25, approach_accel: float = 1.2,
+                 print_speed: float = 0.25, print_accel: float = 1.2,
+                 gantry_time: float = 6.0, handshake_time: float = 0.05,
+                 home: tuple = (0.2, 0.3, 0.3)):
+        self.travel_speed = travel_speed
+        self.travel_accel = travel_accel
+        self.approach_speed = approach_speed
+        self.approach_accel = approach_accel
+        self.print_speed = print_speed
+        self.print_accel = print_accel
+        self.gantry_time = gantry_time
+        self.handshake_time = handshake_time
+        self.home = tuple(home)
+
+    def travel(self, start, end):
+        return move_time(math.dist(start, end), self.travel_speed, self.travel_accel)
+
+    def approach(self, distance):
+        return move_time(distance, self.approach_speed, self.approach_accel)
+
+    def print_move(self, distance):
+        return move_time(distance, self.print_speed, self.print_accel)
+
+
+class CycleEstimate():
+    """Predicted time of a task list, split by kind of move"""
+    def __init__(self):
+        self.tasks = []  # (task, seconds)
+        self.breakdown = {"travel": 0.0, "approach": 0.0, "print": 0.0, "home": 0.0, "gantry": 0.0, "handshake": 0.0}
+
+    def add(self, kind: str, seconds: float):
+        self.breakdown[kind] += seconds
+        return seconds
+
+    @property
+    def total(self):
+        return sum(self.breakdown.values())
+
+    @property
+    def prints(self):
+        return sum(1 for (task_type, _), _ in self.tasks if task_type == "control")
+
+
+def task_endpoints(task_args: list):
+    """Start and end of a control task's print move, (x, y, z) before the approach and after the retract"""
+    direction, x1, _, x3, y, z, z_clear = task_args[:7]
+    if direction == 2:  # right2left
+        x1, x3 = x3, x1
+    return (x1, y, z_clear), (x3, y, z_clear)
+
+
+def simulate(tasks: list, model: MotionModel = None, gantry: tuple = (1, 0)):
+    """Estimate the cycle time of a task list, gantry is the position set at the start of process()"""
+    model = model or MotionModel()
+    estimate = CycleEstimate()
+    position = model.home
+    gantry = tuple(gantry)
+    for task in tasks:
+        task_type, task_args = task
+        seconds = 0.0
+        if task_type == "gantry":
+            if tuple(task_args) != gantry:
+                seconds += estimate.add("gantry", model.gantry_time)
+            gantry = tuple(task_args)
+        elif task_type == "home":
+            seconds += estimate.add("home", model.travel(position, model.home))
+            seconds += estimate.add("handshake", model.handshake_time)
+            position = model.home
+        elif task_type == "control":
+            start, end = task_endpoints(task_args)
+            _, _, _, _, _, z, z_clear = task_args[:7]
+            seconds += estimate.add("travel", model.travel(position, start))
+            seconds += estimate.add("approach", 2 * model.approach(abs(z_clear - z)))  # down, and back up after
+            seconds += estimate.add("print", model.print_move(math.dist(start, end)))
+            seconds += estimate.add("handshake", model.handshake_time)
+            position = end
+        else:
+            raise ValueError("Unknown task type: " + str(task_type))
+        estimate.tasks.append((task, seconds))
+    return estimate
+
+
+def cpu_ms(tasks: list, model: MotionModel = None, repeat: int = 100):
+    """CPU milliseconds per simulate call"""
+    start = time.process_time()
+    for _ in range(repeat):
+        simulate(tasks, model)
+    return 1000 * (time.process_time() - start) / repeat
+
+
+def format_estimates(rows: list):
+    """One line per (name, estimate, cpu ms)"""
+    lines = [f"{'format':<28}{'prints':>7}{'cycle s':>9}{'travel':>8}{'print':>8}{'home':>7}{'gantry':>8}{'cpu ms':>8}"]
+    for name, estimate, ms in rows:
+        b = estimate.breakdown
+        lines.append(f"{name:<28}{estimate.prints:>7}{estimate.total:>9.2f}{b['travel'] + b['approach']:>8.2f}"
+                     f"{b['print']:>8.2f}{b['home']:>7.2f}{b['gantry']:>8.2f}{ms:>8.3f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predict portmark cycle times for every carton format")
+    parser.add_argument("--travel-speed", type=float, default=1.0)
+    parser.add_argument("--print-speed", type=float, default=0.25)
+    parser.add_argument("--gantry-time", type=float, default=6.0)
+    args = parser.parse_args()
+    model = MotionModel(travel_speed=args.travel_speed, print_speed=args.print_speed, gantry_time=args.gantry_time)
+
+    rows = []
+    for stack_format in cartons_enum:
+        for alternating in (True, False):
+            tasks = stack_tasks(stack_format, alternating=alternating)
+            name = stack_format.name + ("" if alternating else " one-way")
+            rows.append((name, simulate(tasks, model), cpu_ms(tasks, model)))
+    print(format_estimates(rows))
@@ -0,0 +1,329 @@
+"""A local stand-in for the UR10 controller RTDE interface.
+
+Serves the RTDE protocol (V/v/O/I/S/P/U/M) on a TCP port and runs an emulation of
+the portmark robot program on the registers in portmark.xml, so portmark.py and the
+RTDE client can be exercised offline, at rates and scales ursim can't reach:
+
+    python mock_robot.py --port 30004 --speed 10
+"""
+import argparse
+import logging
+import math
+import re
+import socket
+import struct
+import threading
+import time
+
+from rtde import serialize
+from rtde.rtde import Command, LOGNAME
+
+_log = logging.getLogger(LOGNAME + '.mock')
+
+# Types of the non register variables the mock knows about
+VARIABLE_TYPES = {
+    'timestamp': 'DOUBLE',
+    'target_q': 'VECTOR6D',
+    'target_qd': 'VECTOR6D',
+    'actual_q': 'VECTOR6D',
+    'actual_qd': 'VECTOR6D',
+    'target_TCP_pose': 'VECTOR6D',
+    'target_TCP_speed': 'VECTOR6D',
+    'actual_TCP_pose': 'VECTOR6D',
+    'actual_TCP_speed': 'VECTOR6D',
+    'actual_TCP_force': 'VECTOR6D',
+    'speed_scaling': 'DOUBLE',
+    'robot_mode': 'INT32',
+    'safety_mode': 'INT32',
+    'runtime_state': 'UINT32',
+    'actual_digital_input_bits': 'UINT64',
+    'actual_digital_output_bits': 'UINT64',
+    'output_bit_registers0_to_31': 'UINT32',
+    'output_bit_registers32_to_63': 'UINT32',
+}
+
+REGISTER_TYPES = {'bit': 'BOOL', 'int': 'INT32', 'double': 'DOUBLE'}
+
+DEFAULT_VALUES = {'BOOL': False, 'INT32': 0, 'UINT32': 0, 'UINT64': 0, 'DOUBLE': 0.0, 'VECTOR6D': [0.0] * 6}
+
+HOME_Q = [0.0, -math.pi / 2, math.pi / 2, -math.pi / 2, -math.pi / 2, 0.0]
+
+
+def variable_type(name):
+    """RTDE type of a variable name, NOT_FOUND if the mock does not provide it"""
+    match = re.match(r'(input|output)_(bit|int|double)_register_(\d+)$', name)
+    if match:
+        return REGISTER_TYPES[match.group(2)]
+    return VARIABLE_TYPES.get(name, 'NOT_FOUND')
+
+
+class PortmarkProgram():
+    """Emulates the PreProd URP on the registers of portmark.xml.
+
+    Time is simulated: every output package advances the program by one period times speed,
+    so the handshake behaves the same at 125 Hz or several kHz.
+    """
+    def __init__(self, task_time: float = 2.0, home_time: float = 3.0, speed: float = 1.0):
+        self.task_time = task_time
+        self.home_time = home_time
+        self.speed = speed
+        self.time = 0.0
+        self.task_started = None
+        self.home_started = None
+        self.pose = [0.0, 0.0, 0.0, 0.0, math.pi, 0.0]
+        self.tasks_done = 0
+
+    def step(self, dt: float, inputs: dict, outputs: dict):
+        """Advance the program by dt (wall) seconds, reading inputs and writing outputs"""
+        dt *= self.speed
+        self.time += dt
+        outputs['timestamp'] = self.time
+        outputs['output_bit_register_74'] = True  # PROG RUNNING
+        previous = list(self.pose)
+
+        # Homing, requested through CANCEL HOME
+        if inputs.get('input_bit_register_76') and self.home_started is None and not outputs.get('output_bit_register_67'):
+            self.home_started = self.time
+            outputs['output_bit_register_66'] = True   # MOVING HOME
+            outputs['output_bit_register_67'] = False  # HOMED
+        elif self.home_started is not None and self.time - self.home_started >= self.home_time:
+            self.home_started = None
+            self.pose[:3] = [0.0, 0.0, 0.0]
+            outputs['output_bit_register_66'] = False
+            outputs['output_bit_register_67'] = True
+        elif not inputs.get('input_bit_register_76') and self.home_started is None:
+            outputs['output_bit_register_67'] = False
+
+        # Print tasks, NEXT TASK -> TASK CURRENT / ACTIVE / DONE
+        next_task = inputs.get('input_int_register_0', 0)
+        current = outputs.get('output_int_register_0', 0)
+        if current == 0 and next_task != 0 and self.task_started is None and self.home_started is None:
+            self.task_started = self.time
+            outputs['output_int_register_0'] = next_task
+            outputs['output_bit_register_64'] = True
+            outputs['output_bit_register_65'] = False
+        elif self.task_started is not None:
+            progress = min(1.0, (self.time - self.task_started) / self.task_time)
+            # pipelined tasks above 10 read the positions_b bank, 12 registers up
+            bank = 12 if current > 10 else 0
+            x1 = inputs.get(f'input_double_register_{bank}', 0.0)
+            x3 = inputs.get(f'input_double_register_{bank + 2}', 0.0)
+            if current % 10 == 2:  # right2left
+                x1, x3 = x3, x1
+            self.pose[0] = x1 + (x3 - x1) * progress
+            self.pose[1] = inputs.get(f'input_double_register_{bank + 3}', 0.0)
+            self.pose[2] = inputs.get(f'input_double_register_{bank + 6}', 0.0)
+            outputs['output_bit_register_68'] = 0.1 < progress < 0.9  # PRINTING
+            if progress >= 1.0:
+                self.task_started = None
+                self.tasks_done += 1
+                outputs['output_bit_register_64'] = False
+                outputs['output_bit_register_65'] = True
+        elif current != 0 and next_task == 0:  # CONTROL ACK
+            outputs['output_int_register_0'] = 0
+            outputs['output_bit_register_65'] = False
+
+        speed = [(p - q) / dt if dt else 0.0 for p, q in zip(self.pose, previous)]
+        outputs['actual_TCP_pose'] = list(self.pose)
+        outputs['target_TCP_pose'] = list(self.pose)
+        outputs['actual_TCP_speed'] = speed
+        outputs['target_TCP_speed'] = speed
+        outputs['actual_q'] = [q + p for q, p in zip(HOME_Q, self.pose[:3] + [0.0, 0.0, 0.0])]
+        outputs['target_q'] = outputs['actual_q']
+
+
+class RTDEServer():
+    """Serves the RTDE protocol for one robot, one client at a time"""
+    session_class = None  # Session subclass handling connections, defaults to Session
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 30004, program: PortmarkProgram = None,
+                 frequency: float = None, version: tuple = (3, 15, 0, 0)):
+        """frequency overrides the frequency requested by the client"""
+        self.program = program if program is not None else PortmarkProgram()
+        self.frequency = frequency
+        self.version = version
+        self.inputs = {}
+        self.outputs = {}
+        self.lock = threading.Lock()
+        self.sent_packages = 0
+        self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__sock.bind((host, port))
+        self.__sock.listen(1)
+        self.__thread = None
+        self.__running = False
+
+    @property
+    def port(self):
+        return self.__sock.getsockname()[1]
+
+    def start(self):
+        """Serve on a background thread"""
+        self.__running = True
+        self.__thread = threading.Thread(target=self.serve_forever, name='rtde-server', daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__running = False
+        self.__sock.close()
+
+    def serve_forever(self):
+        self.__running = True
+        while self.__running:
+            try:
+                conn, addr = self.__sock.accept()
+            except OSError:
+                break
+            _log.info('Client connected from %s', addr)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                (self.session_class or Session)(self, conn).run()
+            except (ConnectionError, OSError) as e:
+                _log.info('Client disconnected: %s', e)
+            finally:
+                conn.close()
+
+
+class Session():
+    """One client connection: command handling plus the output stream"""
+    def __init__(self, server: RTDEServer, conn):
+        self.server = server
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.output_config = None
+        self.output_object = None
+        self.frequency = 125.0
+        self.input_configs = {}
+        self.used_inputs = set()
+        self.streaming = threading.Event()
+        self.stream_thread = None
+
+    def send(self, command, payload=b''):
+        with self.send_lock:
+            self.conn.sendall(serialize.HEADER.pack(len(payload) + 3, command) + payload)
+
+    def run(self):
+        buf = b''
+        try:
+            while True:
+                more = self.conn.recv(4096)
+                if not more:
+                    return
+                buf += more
+                while len(buf) >= 3:
+                    size, command = serialize.HEADER.unpack_from(buf)
+                    if len(buf) < size:
+                        break
+                    payload, buf = buf[3:size], buf[size:]
+                    self.on_command(command, payload)
+        finally:
+            self.streaming.clear()
+            if self.stream_thread is not None:
+                self.stream_thread.join()
+
+    def on_command(self, command, payload):
+        if command == Command.RTDE_REQUEST_PROTOCOL_VERSION:
+            version = struct.unpack('>H', payload)[0]
+            self.send(command, struct.pack('>B', version in (1, 2)))
+        elif command == Command.RTDE_GET_URCONTROL_VERSION:
+            self.send(command, struct.pack('>IIII', *self.server.version))
+        elif command == Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS:
+            self.frequency = self.server.frequency or struct.unpack_from('>d', payload)[0]
+            names = payload[8:].decode('utf-8').split(',')
+            types = [variable_type(n) for n in names]
+            reply = struct.pack('>B', 1 if 'NOT_FOUND' not in types else 0) + ','.join(types).encode('utf-8')
+            if 'NOT_FOUND' not in types:
+                self.output_config = self.make_config(1, names, types)
+                self.output_object = self.output_config.data_class(1)
+            self.send(command, reply)
+        elif command == Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS:
+            names = payload.decode('utf-8').split(',')
+            types = [variable_type(n) if n not in self.used_inputs else 'IN_USE' for n in names]
+            recipe_id = len(self.input_configs) + 2
+            if 'NOT_FOUND' in types or 'IN_USE' in types:
+                recipe_id = 0
+            else:
+                self.input_configs[recipe_id] = self.make_config(recipe_id, names, types)
+                self.used_inputs.update(names)
+            self.send(command, struct.pack('>B', recipe_id) + ','.join(types).encode('utf-8'))
+        elif command == Command.RTDE_CONTROL_PACKAGE_START:
+            self.send(command, struct.pack('>B', self.output_config is not None))
+            if self.output_config is not None and not self.streaming.is_set():
+                self.streaming.set()
+                self.stream_thread = threading.Thread(target=self.stream, name='rtde-stream', daemon=True)
+                self.stream_thread.start()
+        elif command == Command.RTDE_CONTROL_PACKAGE_PAUSE:
+            self.streaming.clear()
+            if self.stream_thread is not None:
+                self.stream_thread.join()
+                self.stream_thread = None
+            self.send(command, struct.pack('>B', 1))
+        elif command == Command.RTDE_DATA_PACKAGE:
+            config = self.input_configs.get(payload[0])
+            if config is None:
+                _log.error('Unknown input recipe id: %d', payload[0])
+                return
+            data = config.unpack(payload)
+            with self.server.lock:
+                for name in config.names:
+                    self.server.inputs[name] = getattr(data, name)
+        elif command == Command.RTDE_TEXT_MESSAGE:
+            _log.info('Client message: %r', payload)
+        else:
+            _log.error('Unknown package command: %d', command)
+
+    def make_config(self, recipe_id, names, types):
+        config = serialize.DataConfig.unpack_recipe(struct.pack('>B', recipe_id) + ','.join(types).encode('utf-8'))
+        config.names = names
+        return config
+
+    def stream(self):
+        """Sends output packages at the recipe frequency, catching up in one write when late"""
+        server = self.server
+        config = self.output_config
+        obj = self.output_object
+        period = 1.0 / self.frequency
+        header = serialize.HEADER.pack(config.struct.size + 3, Command.RTDE_DATA_PACKAGE)
+        defaults = [(name, DEFAULT_VALUES[t]) for name, t in zip(config.names, config.types)]
+        next_time = time.perf_counter()
+        while self.streaming.is_set():
+            now = time.perf_counter()
+            if now < next_time:
+                time.sleep(min(next_time - now, 0.001))
+                continue
+            due = min(int((now - next_time) / period) + 1, 1000)
+            packages = []
+            with server.lock:
+                for _ in range(due):
+                    server.program.step(period, server.inputs, server.outputs)
+                    for name, default in defaults:
+                        setattr(obj, name, server.outputs.get(name, default))
+                    packages.append(header + config.pack(obj))
+            try:
+                with self.send_lock:
+                    self.conn.sendall(b''.join(packages))
+            except OSError:
+                return
+            server.sent_packages += due
+            next_time += due * period
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local RTDE stand-in running the portmark program emulation")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=30004)
+    parser.add_argument("--frequency", type=float, default=None, help="override the client's output frequency (Hz)")
+    parser.add_argument("--speed", type=float, default=1.0, help="program time per wall time")
+    parser.add_argument("--task-time", type=float, default=2.0, help="seconds per print pass")
+    parser.add_argument("--home-time", type=float, default=3.0, help="seconds to home")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    program = PortmarkProgram(task_time=args.task_time, home_time=args.home_time, speed=args.speed)
+    server = RTDEServer(args.host, args.port, program, frequency=args.frequency)
+    _log.info('Serving RTDE on %s:%d', args.host, server.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
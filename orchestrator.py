@@ -0,0 +1,132 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from portmark import UR10_RTDE, stack_tasks, cartons_enum
+
+
+class CellReport():
+    """Running totals for one portmarking cell"""
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.status = "waiting"
+        self.stacks = 0
+        self.cycle_times = []
+        self.errors = []
+        self.received = 0
+        self.dropped = 0
+        self.started = None
+        self.finished = None
+
+    @property
+    def name(self):
+        return f"{self.host}:{self.port}"
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def stacks_per_hour(self):
+        return 3600 * self.stacks / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mean_cycle_time(self):
+        return sum(self.cycle_times) / len(self.cycle_times) if self.cycle_times else None
+
+
+def program_stopped():
+    """Restart policy of a cell: fail it, the console can not prompt for several robots"""
+    raise RuntimeError("program stopped on the controller")
+
+
+def run_cell(report: CellReport, tasks: list, config_filename: str = 'portmark.xml', stacks: int = 1,
+             stop: threading.Event = None):
+    """Run stacks of tasks on one robot, one connection per stack, filling in the report"""
+    report.started = time.time()
+    try:
+        for _ in range(stacks):
+            if stop is not None and stop.is_set():
+                report.status = "stopped"
+                return report
+            report.status = "connecting"
+            robo = UR10_RTDE(report.host, report.port, config_filename, name=report.name,
+                             stop=stop, restart_choice=program_stopped)
+            try:
+                for task in tasks:
+                    robo.add_task(task)
+                report.status = "running"
+                start = time.time()
+                robo.process()
+                if stop is not None and stop.is_set():
+                    report.status = "stopped"
+                    return report
+                report.cycle_times.append(time.time() - start)
+                report.stacks += 1
+            finally:
+                report.received += robo.con.received_package_count
+                report.dropped += robo.con.skipped_package_count
+                if robo.con.is_connected():
+                    robo.end()
+        report.status = "done"
+    except (Exception, SystemExit) as e:
+        # process() exits on a failed start, keep the other cells running
+        report.status = "failed"
+        report.errors.append(repr(e))
+    finally:
+        report.finished = time.time()
+    return report
+
+
+def run_cells(cells: dict, config_filename: str = 'portmark.xml', stacks: int = 1, port: int = 30004):
+    """Runs every cell concurrently, cells maps host (or (host, port)) to its task list"""
+    reports = []
+    jobs = []
+    for host, tasks in cells.items():
+        host, cell_port = host if isinstance(host, tuple) else (host, port)
+        reports.append(CellReport(host, cell_port))
+        jobs.append(tasks)
+
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=max(1, len(reports)), thread_name_prefix="cell")
+    futures = [pool.submit(run_cell, r, tasks, config_filename, stacks, stop) for r, tasks in zip(reports, jobs)]
+    try:
+        for future in futures:
+            future.result()
+    except KeyboardInterrupt:
+        # running cells return on their next package, queued ones never start
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return reports
+
+
+def format_report(reports: list):
+    """One line per cell and a line for the whole line of cells"""
+    lines = [f"{'cell':<24}{'status':<12}{'stacks':>7}{'mean cycle s':>14}{'stacks/h':>10}{'received':>10}{'dropped':>9}"]
+    for r in reports:
+        mean = f"{r.mean_cycle_time:.2f}" if r.mean_cycle_time is not None else "-"
+        lines.append(f"{r.name:<24}{r.status:<12}{r.stacks:>7}{mean:>14}{r.stacks_per_hour:>10.1f}{r.received:>10}{r.dropped:>9}")
+        for error in r.errors:
+            lines.append(f"    {error}")
+    total = sum(r.stacks_per_hour for r in reports)
+    healthy = sum(1 for r in reports if r.status == "done")
+    lines.append(f"{len(reports)} cells, {healthy} healthy, {total:.1f} stacks/h combined")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    carton = cartons_enum.frozen_small
+    CELLS = {
+        ('ursim', 30004): stack_tasks(carton),
+        #('12.10.11.21', 30004): stack_tasks(carton),
+    }
+    try:
+        reports = run_cells(CELLS, stacks=1)
+    except KeyboardInterrupt:
+        print("Keyboard interrupt")
+    else:
+        print(format_report(reports))
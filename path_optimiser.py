@@ -0,0 +1,153 @@
+"""Print path ordering for portmark task lists.
+
+generate_coords lists print rows bottom to top and print_coord_to_tasks alternates
+left2right/right2left. The rows of a side can be printed in any order and either
+direction, only the travel between them changes. This searches both, exactly for
+up to EXACT_ROWS rows and with nearest neighbour plus 2-opt above, minimising the
+travel time of the cycle_sim model. The result is a task list for UR10_RTDE.add_task.
+"""
+import argparse
+from cycle_sim import MotionModel, simulate, task_endpoints
+from portmark import (cartons_enum, generate_coords, print_coord_to_tasks, stack_tasks,
+                      entry_tasks, exit_tasks)
+
+EXACT_ROWS = 10
+
+
+def flip(task: tuple):
+    """The same print row in the other direction"""
+    task_type, task_args = task
+    return task_type, [3 - task_args[0]] + list(task_args[1:])
+
+
+def route_time(route: list, model: MotionModel, start: tuple, end: tuple = None):
+    """Travel time of a list of control tasks, from start and back to end when given"""
+    seconds = 0.0
+    position = start
+    for task in route:
+        first, last = task_endpoints(task[1])
+        seconds += model.travel(position, first)
+        position = last
+    if end is not None:
+        seconds += model.travel(position, end)
+    return seconds
+
+
+def _exact(variants, model, start, end):
+    """Held-Karp over (row, direction), returns the best route"""
+    n = len(variants)
+    ends = [[task_endpoints(v[1]) for v in pair] for pair in variants]
+    # cost[i][o][j][p]: from the end of row i in direction o to the start of row j in direction p
+    cost = [[[[model.travel(ends[i][o][1], ends[j][p][0]) for p in range(2)] for j in range(n)]
+             for o in range(2)] for i in range(n)]
+    inf = float("inf")
+    best = [[[inf, inf] for _ in range(n)] for _ in range(1 << n)]
+    parent = [[[None, None] for _ in range(n)] for _ in range(1 << n)]
+    for i in range(n):
+        for o in range(2):
+            best[1 << i][i][o] = model.travel(start, ends[i][o][0])
+
+    for mask in range(1, 1 << n):
+        for i in range(n):
+            if not mask & (1 << i):
+                continue
+            for o in range(2):
+                here = best[mask][i][o]
+                if here == inf:
+                    continue
+                row_cost = cost[i][o]
+                for j in range(n):
+                    if mask & (1 << j):
+                        continue
+                    following = mask | (1 << j)
+                    for p in range(2):
+                        seconds = here + row_cost[j][p]
+                        if seconds < best[following][j][p]:
+                            best[following][j][p] = seconds
+                            parent[following][j][p] = (i, o)
+
+    full = (1 << n) - 1
+    finish = lambda i, o: best[full][i][o] + (model.travel(ends[i][o][1], end) if end is not None else 0.0)
+    i, o = min(((i, o) for i in range(n) for o in range(2)), key=lambda io: finish(*io))
+    route = []
+    mask = full
+    while True:
+        route.append(variants[i][o])
+        previous = parent[mask][i][o]
+        if previous is None:
+            break
+        mask &= ~(1 << i)
+        i, o = previous
+    return route[::-1]
+
+
+def _heuristic(variants, model, start, end):
+    """Nearest neighbour over (row, direction), then 2-opt segment reversals"""
+    remaining = list(range(len(variants)))
+    route = []
+    position = start
+    while remaining:
+        i, o = min(((i, o) for i in remaining for o in range(2)),
+                   key=lambda io: model.travel(position, task_endpoints(variants[io[0]][io[1]][1])[0]))
+        route.append(variants[i][o])
+        position = task_endpoints(variants[i][o][1])[1]
+        remaining.remove(i)
+
+    seconds = route_time(route, model, start, end)
+    improved = True
+    while improved:
+        improved = False
+        for a in range(len(route) - 1):
+            for b in range(a + 2, len(route) + 1):
+                # reversing a segment also reverses the direction of every row in it
+                candidate = route[:a] + [flip(task) for task in reversed(route[a:b])] + route[b:]
+                candidate_seconds = route_time(candidate, model, start, end)
+                if candidate_seconds < seconds - 1e-9:
+                    route, seconds, improved = candidate, candidate_seconds, True
+    return route
+
+
+def order_prints(tasks: list, model: MotionModel = None, start: tuple = None, end: tuple = None):
+    """Reorders and redirects control tasks for the least travel from start (home by default) to end"""
+    model = model or MotionModel()
+    start = model.home if start is None else start
+    if not tasks:
+        return []
+    variants = [(task, flip(task)) for task in tasks]
+    if len(tasks) <= EXACT_ROWS:
+        return _exact(variants, model, start, end)
+    return _heuristic(variants, model, start, end)
+
+
+def optimise_stack(stack_format, model: MotionModel = None, merge_sides: bool = False):
+    """Like portmark.stack_tasks with the print rows of each side reordered.
+
+    merge_sides goes straight from side A to the gantry swap without homing in between,
+    only use it where the gantry may move with the robot away from home."""
+    model = model or MotionModel()
+    side_a = print_coord_to_tasks(generate_coords(stack_format, side="A", perfect=True))
+    side_b = print_coord_to_tasks(generate_coords(stack_format, side="B", perfect=True))
+    if not merge_sides:
+        return (entry_tasks + order_prints(side_a, model, end=model.home) + exit_tasks +
+                entry_tasks + order_prints(side_b, model, end=model.home) + exit_tasks)
+
+    route_a = order_prints(side_a, model)
+    start_b = task_endpoints(route_a[-1][1])[1] if route_a else model.home
+    gantry_exit = [task for task in exit_tasks if task[0] == "gantry"]
+    return (entry_tasks + route_a + gantry_exit +
+            entry_tasks + order_prints(side_b, model, start=start_b, end=model.home) + exit_tasks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare optimised print orders with the default per carton format")
+    parser.add_argument("--merge-sides", action="store_true", help="also try without homing between sides")
+    args = parser.parse_args()
+
+    model = MotionModel()
+    print(f"{'format':<16}{'default s':>10}{'optimised s':>12}" + (f"{'merged s':>10}" if args.merge_sides else ""))
+    for stack_format in cartons_enum:
+        line = f"{stack_format.name:<16}{simulate(stack_tasks(stack_format), model).total:>10.2f}"
+        line += f"{simulate(optimise_stack(stack_format, model), model).total:>12.2f}"
+        if args.merge_sides:
+            line += f"{simulate(optimise_stack(stack_format, model, merge_sides=True), model).total:>10.2f}"
+        print(line)
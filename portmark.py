@@ -2,8 +2,13 @@ import sys
 import logging
 import csv
 import time
+import collections
 import rtde.rtde as rtde
 import rtde.rtde_config as rtde_config
+import rtde.rtde_receiver as rtde_receiver
+import rtde.csv_binary_writer as csv_binary_writer
+import rtde.csv_binary_reader as csv_binary_reader
+import telemetry
 from datetime import datetime
 from enum import Enum
 from functools import reduce
@@ -14,11 +19,41 @@ logging.getLogger().setLevel(logging.INFO)
 cartons_enum = Enum('cartons', 'frozen_small frozen_large chilled_small chilled_medium chilled_large testing')
 carton = cartons_enum.frozen_small
 
+# Recorded columns, see robo_plotting.py
+xy_head = ["x", "y", "z", "rx", "ry", "rz"]
+joint_head = ["q1", "q2", "q3", "q4", "q5", "q6"]
+speed_head = ["vx", "vy", "vz", "wx", "wy", "wz"]
+tspeed_head = ["vx_t", "vy_t", "vz_t", "wx_t", "wy_t", "wz_t"]
+record_columns = [(name, "d") for name in xy_head + joint_head + speed_head + tspeed_head] + [("print", "?")]
+# Where the columns come from in a binary capture of the state recipe
+capture_columns = ([f"actual_TCP_pose_{i}" for i in range(6)] + [f"actual_q_{i}" for i in range(6)] +
+                   [f"actual_TCP_speed_{i}" for i in range(6)] + [f"target_TCP_speed_{i}" for i in range(6)] +
+                   ["output_bit_register_68"])
+capture_names = dict(zip((name for name, _ in record_columns), capture_columns))
+
+
+def capture_to_csv(capture_file: str, csv_file: str, chunk_rows: int = 4096):
+    """Export the recorded columns of a binary capture to csv, a chunk at a time"""
+    with open(capture_file, 'rb') as f:
+        reader = csv_binary_reader.CSVBinaryReader(f)
+    columns = [getattr(reader, name) for name in capture_columns]
+    with open(csv_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in record_columns])
+        for start in range(0, reader.get_samples(), chunk_rows):
+            writer.writerows(zip(*[c[start:start + chunk_rows].tolist() for c in columns]))
+    return reader.get_samples()
+
+
 class UR10_RTDE():
     keep_running = True
-    tasks = []
 
     controls = Enum('controls', 'left2right right2left')
+    # ready: control and home acked, control_sent: waiting for TASK DONE, home_sent: waiting for HOMED,
+    # control_and_home_sent: homed from the restart prompt with a print task not yet acked
+    phases = Enum('phases', 'ready control_sent home_sent control_and_home_sent')
+    # Pipelined NEXT TASK values above bank_offset read the positions_b registers
+    bank_offset = 10
 
     current_task = None
     task_active = None
@@ -28,11 +63,10 @@ class UR10_RTDE():
     prog_running = None
 
     __state = None
-    rec_positions = []
-    rec_joint_angles = []
-    rec_prints = []
-    rec_speeds = []
-    rec_tspeeds = []
+    recorder = None
+    transition = False
+    started = None
+    flush_interval = 1.0  # seconds between writes of the recording to disk, at most
 
     @property
     def state(self):
@@ -51,14 +85,17 @@ class UR10_RTDE():
         if self.current_task != current_task:
             self.writeout("CURRENT TASK", self.name_task(self.current_task), "->", self.name_task(current_task))
             self.current_task = current_task
+            self.transition = True
 
         if self.task_active != task_active:
             self.writeout("TASK ACTIVE", self.task_active, "->", task_active)
             self.task_active = task_active
+            self.transition = True
 
         if self.task_done != task_done:
             self.writeout("TASK DONE", self.task_done, "->", task_done)
             self.task_done = task_done
+            self.transition = True
 
         if self.printing != printing:
             #self.writeout("PRINTING", self.printing, "->", printing)
@@ -67,16 +104,44 @@ class UR10_RTDE():
         if self.homed != homed:
             self.writeout("HOMED", self.homed, "->", homed)
             self.homed = homed
+            self.transition = True
 
         if self.prog_running != prog_running:
             self.writeout("RUNNING", self.prog_running, "->", prog_running)
             self.prog_running = prog_running
+            self.transition = True
 
         self.__state = state
 
-    def __init__(self, robo_host: str, robo_port: int, config_filename: str, record: bool = False):
-        """Create the object with focus on connection and recipes"""
+    def __init__(self, robo_host: str, robo_port: int, config_filename: str, record: bool = False, lossless: bool = False,
+                 threaded: bool = False, name: str = None, record_file: str = None, pipelined: bool = False,
+                 refresh_period: float = None, stop=None, restart_choice=None):
+        """Create the object with focus on connection and recipes.
+        With lossless recording every package from the controller is recorded instead of every third loop.
+        Threaded reads the socket on a background thread so a slow loop does not stall the stream.
+        The name prefixes log lines when several robots share one console.
+        Pipelined stages the next print task into the idle one of two position register banks
+        while the current one runs, so its dispatch is only the NEXT TASK write.
+        Input recipes are only sent when their values changed, or when last sent more than
+        refresh_period seconds ago if given.
+        process() returns once the stop event (threading.Event) is set. When the program stops on the
+        controller restart_choice() picks what next (see restart()), instead of prompting on the console.
+        Recordings stream to record_file as they arrive: lossless ones as a raw binary capture of the
+        state recipe (data.bin, see rtde/csv_binary_writer.py), sampled ones to data.tlm (see telemetry.py)"""
         self.record = record
+        self.lossless = lossless
+        self.threaded = threaded
+        self.name = name
+        self.pipelined = pipelined
+        self.stop = stop
+        self.restart_choice = restart_choice or (lambda: eval(input("What next? {1: resume, 2: restart, 3: home}")))
+
+        # Per robot queue and recording, so several cells can run in one process
+        self.tasks = collections.deque()
+        self.phase = self.phases.ready
+        self.bank = 0  # bank of the next print task
+        self.staged = None  # task args already written to that bank
+        self.record_file = record_file or ("data.bin" if lossless else "data.tlm")
 
         # get recipes!
         # For these recipes, see the file portmark.xml
@@ -87,39 +152,239 @@ class UR10_RTDE():
         self.home_names, self.home_types = conf.get_recipe('home')
         self.control_names, self.control_types = conf.get_recipe('control')
         self.positions_names, self.positions_types = conf.get_recipe('positions')
+        if pipelined:
+            self.positions_b_names, self.positions_b_types = conf.get_recipe('positions_b')
 
         # connect, get controller version
         self.con = rtde.RTDE(robo_host, robo_port)
         self.con.connect()
         self.con.get_controller_version()
+        self.con.suppress_unchanged(refresh_period=refresh_period)
 
         # setup recipes
         # These are objcts which get transferred across
-        self.con.send_output_setup(self.state_names, self.state_types)
+        # The state object is updated in place on every receive, copy what is kept.
+        # Not when threaded, the receiver thread would update it under our feet.
+        self.con.send_output_setup(self.state_names, self.state_types, reuse=not threaded)
         self.gantry = self.con.send_input_setup(self.gantry_names, self.gantry_types)
         self.internal = self.con.send_input_setup(self.internal_names, self.internal_types)
         self.home = self.con.send_input_setup(self.home_names, self.home_types)
         self.control = self.con.send_input_setup(self.control_names, self.control_types)
         self.positions = self.con.send_input_setup(self.positions_names, self.positions_types)
+        self.banks = [(self.positions, self.positions_names)]
+        if pipelined:
+            self.positions_b = self.con.send_input_setup(self.positions_b_names, self.positions_b_types)
+            self.banks.append((self.positions_b, self.positions_b_names))
+
+        self.receiver = rtde_receiver.RTDEReceiver(self.con) if threaded else None
 
 
     def name_task(self, value: int):
         if (value is None) or (value == 0):
             return "None"
+        if value > self.bank_offset:
+            return self.controls(value - self.bank_offset).name + " B"
         return self.controls(value).name
 
     def writeout(self, *msg: str):
         current_time = datetime.now().strftime("%H:%M:%S.%f")
-        print(current_time + ":", *msg)
+        if self.name:
+            print(current_time + ":", "[" + self.name + "]", *msg)
+        else:
+            print(current_time + ":", *msg)
+
+    def record_state(self, state):
+        """Append a state sample to the recording"""
+        self.recorder.append(*state.actual_TCP_pose, *state.actual_q, *state.actual_TCP_speed,
+                             *state.target_TCP_speed, state.output_bit_register_68)
+
+    def record_all(self):
+        """Move the packages recorded by the connection into the recording"""
+        if self.threaded:
+            recorded = self.receiver.take_recorded()
+            if not self.receiver.is_alive():
+                recorded += self.con.take_recorded()
+        else:
+            recorded = self.con.take_recorded()
+        # raw payloads, written without decoding
+        self.recorder.writerows(payload for _, payload in recorded)
+        if time.monotonic() - self.capture_flushed >= self.flush_interval:
+            self.capture.flush()
+            self.capture_flushed = time.monotonic()
 
     def add_task(self, task: tuple):
         """put a task on the queue"""
-        self.tasks += [task]
+        self.tasks.append(task)
+
+    def send_gantry(self, task_args):
+        self.gantry.input_bit_register_74 = task_args[0]
+        self.gantry.input_bit_register_75 = task_args[1]
+        self.con.mark(self.gantry)
+        return True
+
+    def send_home(self, task_args):
+        self.home.input_bit_register_76 = task_args[0]
+        self.con.mark(self.home)
+        self.phase = self.phases.home_sent
+        self.writeout("")
+        self.writeout("SENT CONTROL home")
+        return True
+
+    def send_positions(self, task_args, bank: int = 0):
+        """Write a print task's coordinates to a register bank, fields in portmark.xml order"""
+        positions, names = self.banks[bank]
+        for name, value in zip(names, task_args[1:7]):
+            setattr(positions, name, value)
+        self.con.mark(positions)
+
+    def stage(self):
+        """Pipelined, preload the next print task into the idle bank while the current one runs"""
+        if not self.tasks:
+            return
+        task_type, task_args = self.tasks[0]
+        if task_type == "control" and self.staged is not task_args:
+            self.send_positions(task_args, self.bank)
+            self.staged = task_args
+
+    def send_control(self, task_args):
+        """Only once the robot is idle, returns whether the task was sent.
+        Marks the coordinates before NEXT TASK, flush() keeps that order within its one write"""
+        if (self.current_task != 0) or self.task_active:
+            return False
+        if self.staged is not task_args:
+            self.send_positions(task_args, self.bank)
+        self.staged = None
+
+        self.control.input_int_register_0 = task_args[0] + self.bank * self.bank_offset
+        self.con.mark(self.control)
+        if self.pipelined:
+            self.bank = 1 - self.bank
+        self.phase = self.phases.control_sent
+        self.writeout("")
+        self.writeout("SENT CONTROL", self.name_task(self.control.input_int_register_0))
+        return True
+
+    def home_acked(self):
+        return self.homed
+
+    def ack_home(self):
+        self.home.input_bit_register_76 = 0
+        self.con.mark(self.home)
+        self.writeout("HOME ACK")
+
+    def control_acked(self):
+        return (self.current_task != 0) and (not self.task_active) and self.task_done
+
+    def ack_control(self):
+        """Emulates PLC control ack"""
+        self.control.input_int_register_0 = 0
+        self.con.mark(self.control)
+        self.writeout("CONTROL ACK")
+
+    # Which task types may be sent in each phase. Gantry moves go out straight away,
+    # homing waits for the control ack and print tasks for every ack
+    dispatch_table = {
+        (phases.ready, "gantry"): send_gantry,
+        (phases.ready, "home"): send_home,
+        (phases.ready, "control"): send_control,
+        (phases.control_sent, "gantry"): send_gantry,
+        (phases.home_sent, "gantry"): send_gantry,
+        (phases.home_sent, "home"): send_home,
+        (phases.control_and_home_sent, "gantry"): send_gantry,
+    }
+    # The acks awaited in each phase, first ready one wins: (condition, action, next phase)
+    ack_table = {
+        phases.control_sent: [(control_acked, ack_control, phases.ready)],
+        phases.home_sent: [(home_acked, ack_home, phases.ready)],
+        phases.control_and_home_sent: [(home_acked, ack_home, phases.control_sent),
+                                       (control_acked, ack_control, phases.home_sent)],
+    }
+
+    def advance(self):
+        """Runs the tables until nothing more can be sent or acked, on register transitions only.
+        A phase entered by a send here is only acked on a later package, the state read now predates
+        the request (HOMED may still be high from the last home)"""
+        self.transition = False
+        requested = False
+        while self.prog_running:
+            if self.tasks:
+                task_type, task_args = self.tasks[0]
+                send = self.dispatch_table.get((self.phase, task_type))
+                phase = self.phase
+                if send is not None and send(self, task_args):
+                    self.tasks.popleft()
+                    requested = requested or self.phase is not phase
+                    continue
+            if requested:
+                # look again on the next package even if no register changes
+                self.transition = True
+                break
+            for acked, ack, phase in self.ack_table.get(self.phase, ()):
+                if acked(self):
+                    ack(self)
+                    self.phase = phase
+                    break
+            else:
+                break
+        if self.pipelined:
+            self.stage()
+
+    def stopped(self):
+        if self.stop is not None and self.stop.is_set():
+            self.writeout("Stopped")
+            return True
+        return False
+
+    def restart(self, choice: int):
+        """Restart a stopped program, 1: resume, 2: restart, 3: home. Returns False for anything else"""
+        if choice == 1:
+            self.internal.input_bit_register_64 = 1
+            self.internal.input_bit_register_65 = 0
+            self.con.mark(self.internal)
+        elif choice == 2:
+            self.internal.input_bit_register_64 = 0
+            self.internal.input_bit_register_65 = 1
+            self.con.mark(self.internal)
+        elif choice == 3:
+            # a print task sent but not acked yet still needs its ack after homing
+            if self.phase in (self.phases.control_sent, self.phases.control_and_home_sent):
+                self.phase = self.phases.control_and_home_sent
+            else:
+                self.phase = self.phases.home_sent
+            self.home.input_bit_register_76 = 1
+            self.con.mark(self.home)
+            self.internal.input_bit_register_64 = 0
+            self.internal.input_bit_register_65 = 1
+            self.con.mark(self.internal)
+        else:
+            return False
+        self.con.flush()
+        return True
+
+    def receive(self):
+        """Get the latest state from the connection, or from the receiver thread"""
+        if self.threaded:
+            return self.receiver.receive()
+        return self.con.receive()
 
     def begin(self):
         """Start data synchronization"""
+        # before the start, or the receiver thread reads packages that are never recorded
+        if self.record and self.lossless:
+            self.con.start_recording(binary=True)
         if not self.con.send_start():
             sys.exit()
+        # only now, a failed start must not wipe the last recording
+        if self.record and self.lossless:
+            self.capture = open(self.record_file, 'wb')
+            self.recorder = csv_binary_writer.CSVBinaryWriter(self.capture, self.state_names, self.state_types)
+            self.recorder.writeheader()
+            self.capture_flushed = time.monotonic()
+        elif self.record:
+            self.recorder = telemetry.TelemetryRecorder(self.record_file, record_columns,
+                                                        flush_interval=self.flush_interval)
+        if self.threaded:
+            self.receiver.start()
 
     def process(self):
         """The program main loop"""
@@ -129,62 +394,44 @@ class UR10_RTDE():
         # Set gantry to position A
         self.gantry.input_bit_register_74 = 1
         self.gantry.input_bit_register_75 = 0
-        self.con.send(self.gantry)
+        self.con.mark(self.gantry)
 
         # Set all position information to zero
-        self.positions.input_double_register_0 = 0
-        self.positions.input_double_register_1 = 0
-        self.positions.input_double_register_2 = 0
-        self.positions.input_double_register_3 = 0
-        self.positions.input_double_register_6 = 0
-        self.positions.input_double_register_9 = 0
-        self.con.send(self.positions)
+        for bank in range(len(self.banks)):
+            self.send_positions([0] * 7, bank)
+        self.bank = 0
+        self.staged = None
 
         # Set cancel home
         self.home.input_bit_register_76 = 0
-        self.con.send(self.home)
+        self.con.mark(self.home)
 
         # Set next task
         self.control.input_int_register_0 = 0
-        self.con.send(self.control)
+        self.con.mark(self.control)
+        self.con.flush()
+        self.started = time.time()
 
 
         program_counter = 0 # This count is used to periodically sample robot infor
-        control_ack = True  # Emulates PLC control ack
-        home_ack = True     # Emulates PLC home ack
+        self.phase = self.phases.ready
 
-        while True:
+        while not self.stopped():
             # Check the connection
-            self.state = self.con.receive()
+            self.state = self.receive()
             if self.state is None:
                 self.writeout("Conn lost")
                 break
 
             # Restart the program
             if not self.prog_running:
-                next = eval(input("What next? {1: resume, 2: restart, 3: home}"))
-                if next == 1:
-                    self.internal.input_bit_register_64 = 1
-                    self.internal.input_bit_register_65 = 0
-                    self.con.send(self.internal)
-                elif next == 2:
-                    self.internal.input_bit_register_64 = 0
-                    self.internal.input_bit_register_65 = 1
-                    self.con.send(self.internal)
-                elif next == 3:
-                    home_ack = False
-                    self.home.input_bit_register_76 = 1
-                    self.con.send(self.home)
-                    self.internal.input_bit_register_64 = 0
-                    self.internal.input_bit_register_65 = 1
-                    self.con.send(self.internal)
-                else:
+                if not self.restart(self.restart_choice()):
                     continue
 
                 # Forgot what this is for, potentially takes some time for above command
                 # to restart
-                while not self.prog_running:
-                    self.state = self.con.receive()
+                while not self.prog_running and not self.stopped():
+                    self.state = self.receive()
                     if self.state is None:
                         self.writeout("Conn lost")
                         break
@@ -193,103 +440,75 @@ class UR10_RTDE():
                 # Clear flags
                 self.internal.input_bit_register_64 = 0
                 self.internal.input_bit_register_65 = 0
-                self.con.send(self.internal)
+                self.con.mark(self.internal)
+                self.con.flush()
 
             # Record data
-            if self.record and (not (program_counter % 3)):
-                self.rec_positions.append(self.state.actual_TCP_pose)
-                self.rec_joint_angles.append(self.state.actual_q)
-                self.rec_prints.append(self.printing)
-                self.rec_speeds.append(self.state.actual_TCP_speed)
-                self.rec_tspeeds.append(self.state.target_TCP_speed)
-
-            # Check if tasks are queued
-            if len(self.tasks) < 1:
-                task_type, task_args = None, None
-                if control_ack and home_ack:
-                    self.writeout("")
-                    self.writeout("")
-                    self.writeout("TASKS ALL DONE!")
-                    break
-            else:
-                task_type, task_args = self.tasks[0]  # if len(self.tasks) > 0 else None, None
-
-            if self.prog_running:
-                # Send a task...
-                if task_type == "gantry":
-                    self.gantry.input_bit_register_74 = task_args[0]
-                    self.gantry.input_bit_register_75 = task_args[1]
-                    self.con.send(self.gantry)
-
-                    # Pop task from the list
-                    self.tasks = self.tasks[1:]
-
-                elif task_type == "home" and control_ack:
-                    self.home.input_bit_register_76 = task_args[0]
-                    self.con.send(self.home)
-
-                    # Pop task from the list
-                    self.tasks = self.tasks[1:]
-
-                    home_ack = False
-                    self.writeout("")
-                    self.writeout("SENT CONTROL home")
-
-                elif control_ack and home_ack:
-                    if (self.current_task == 0) and (not self.task_active):
-                        # Get the next fifo queue
-                        # decide what to do
-                        if task_type == "control":
-                            self.positions.input_double_register_0 = task_args[1]
-                            self.positions.input_double_register_1 = task_args[2]
-                            self.positions.input_double_register_2 = task_args[3]
-                            self.positions.input_double_register_3 = task_args[4]
-                            self.positions.input_double_register_6 = task_args[5]
-                            self.positions.input_double_register_9 = task_args[6]
-                            self.con.send(self.positions)
-
-                            self.control.input_int_register_0 = task_args[0]
-                            self.con.send(self.control)
-                            self.tasks = self.tasks[1:]
-
-                            control_ack = False
-                            self.writeout("")
-                            self.writeout("SENT CONTROL", self.name_task(task_args[0]))
-
-                else:
-                    if not home_ack and self.homed:
-                        self.home.input_bit_register_76 = 0
-                        self.con.send(self.home)
-                        self.writeout("HOME ACK")
-                        home_ack = True
-
-                    elif not control_ack and (self.current_task != 0) and (not self.task_active) and (self.task_done):
-                        self.control.input_int_register_0 = 0
-                        self.con.send(self.control)
-                        self.writeout("CONTROL ACK")
-                        control_ack = True
+            if self.record and self.lossless:
+                self.record_all()
+            elif self.record and (not (program_counter % 3)):
+                self.record_state(self.state)
+
+            # Send tasks and acks, only when a register changed, in one write.
+            # Held back while earlier writes wait for the socket, the transition stays pending
+            if self.transition and not self.con.backpressure:
+                self.advance()
+                self.con.flush()
+
+            if not self.tasks and self.phase is self.phases.ready:
+                self.writeout("")
+                self.writeout("")
+                self.writeout("TASKS ALL DONE!")
+                break
 
             program_counter += 1
     
     def wrap_process(self):
-        """Stops the main loop, and writes out data to a csv"""
-        self.end()
-
-        if self.record:
+        """Stops the main loop, closes the recording and exports it to a csv"""
+        if self.threaded:
+            self.receiver.stop()
+            self.writeout("Receiver max queue depth", self.receiver.max_queue_depth,
+                          "max consumer lag", round(self.receiver.max_consumer_lag * 1000, 1), "ms",
+                          "max missed", self.receiver.max_missed,
+                          "dropped", self.receiver.dropped_count)
+        try:
+            if self.record and self.lossless and self.recorder is not None:
+                self.record_all()
+        finally:
+            self.end()
+
+        if self.started is not None:
+            # each package sharing a write saved a send, writes do not select
+            saved = self.con.coalesced_package_count
+            self.writeout("Input packages sent", self.con.sent_package_count,
+                          "coalesced", self.con.coalesced_package_count,
+                          "unchanged", self.con.suppressed_package_count,
+                          "syscalls saved", saved, round(saved / max(time.time() - self.started, 1e-9), 1), "/s")
+            self.writeout("Write latency", ", ".join(("<=" + str(bound) + "us" if bound else "more") + ": " + str(count)
+                                                     for bound, count in self.con.write_latency_histogram if count))
+
+        # no recording when the start failed
+        if self.record and self.recorder is not None:
+            self.writeout("Packages received", self.con.received_package_count,
+                          "consumed", self.con.consumed_package_count,
+                          "dropped", self.con.skipped_package_count)
+            # robo_plotting.py reads csv
             file_name = "data.csv"
-            print("Writing out to file " + file_name)
-            with open(file_name, 'w', newline='') as f:
-                writer = csv.writer(f)
-                xy_head = ["x", "y", "z", "rx", "ry", "rz"]
-                joint_head = ["q1", "q2", "q3", "q4", "q5", "q6"]
-                speed_head = ["vx", "vy", "vz", "wx", "wy", "wz"]
-                tspeed_head = ["vx_t", "vy_t", "vz_t", "wx_t", "wy_t", "wz_t"]
-                writer.writerow(xy_head + joint_head + speed_head + tspeed_head + ["print"])
-                for p, q, v, v_t, pr in zip(self.rec_positions, self.rec_joint_angles, self.rec_speeds, self.rec_tspeeds, self.rec_prints):
-                    writer.writerow(p + q + v + v_t + [pr])
+            if self.lossless:
+                self.capture.close()
+                print("Writing out to file " + file_name)
+                samples = capture_to_csv(self.record_file, file_name)
+            else:
+                self.recorder.close()
+                print("Writing out to file " + file_name)
+                telemetry.TelemetryReader(self.record_file).to_csv(file_name)
+                samples = self.recorder.rows
+            self.writeout("Recorded", samples, "samples to", self.record_file)
 
     def end(self):
         """Close the robot connection"""
+        if self.threaded:
+            self.receiver.stop()
         self.internal.input_bit_register_64 = 0
         self.internal.input_bit_register_65 = 0
         self.con.send(self.internal)
@@ -357,24 +576,25 @@ def generate_coords(stack_format, side="A", perfect=True):
 
     return [[y/1000 for y in x] for x in coords]
 
-if __name__ == "__main__":
-    #HOST, PORT = '12.10.11.21', 30004
-    HOST, PORT = 'ursim', 30004
-
-    # What do do for setup/teardown
-    # Tasks are tuples of (task style: String, task arguments: List)
-    entry_tasks = [("gantry", [1, 0])]
-    exit_tasks = [("home", [1]), ("gantry", [0, 1])]
+# What do do for setup/teardown
+# Tasks are tuples of (task style: String, task arguments: List)
+entry_tasks = [("gantry", [1, 0])]
+exit_tasks = [("home", [1]), ("gantry", [0, 1])]
 
+def stack_tasks(stack_format, alternating: bool = True):
+    """The full task list for a stack_format, side A then side B with gantry moves and homing"""
     # Get tasks for both sides
-    print_coords_a = generate_coords(carton, side="A", perfect=True)
-    print_tasks_a = print_coord_to_tasks(print_coords_a, alternating=True)
-    print_coords_b = generate_coords(carton, side="B", perfect=True)
-    print_tasks_b = print_coord_to_tasks(print_coords_b, alternating=True)
+    print_tasks_a = print_coord_to_tasks(generate_coords(stack_format, side="A", perfect=True), alternating=alternating)
+    print_tasks_b = print_coord_to_tasks(generate_coords(stack_format, side="B", perfect=True), alternating=alternating)
 
     # Combine tasks
-    task_list = entry_tasks + print_tasks_a + exit_tasks
-    task_list += entry_tasks + print_tasks_b + exit_tasks
+    return entry_tasks + print_tasks_a + exit_tasks + entry_tasks + print_tasks_b + exit_tasks
+
+if __name__ == "__main__":
+    #HOST, PORT = '12.10.11.21', 30004
+    HOST, PORT = 'ursim', 30004
+
+    task_list = stack_tasks(carton)
     print("TASK QUEUE:")
     for task in task_list:
         print(task)
@@ -383,7 +603,7 @@ if __name__ == "__main__":
 
     # Try and run the process
     try:
-        robo = UR10_RTDE(HOST, PORT, 'portmark.xml', record=True)
+        robo = UR10_RTDE(HOST, PORT, 'portmark.xml', record=True, lossless=True)
         for task in task_list:
             robo.add_task(task)
 
@@ -1,10 +1,19 @@
+import argparse
+import sys
+import hashlib
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib as mpl
-import pandas as pd
 import matplotlib.pyplot as plt
-from math import sin, cos, pi
+from math import sin, cos, pi, ceil
 import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured, rename_fields
 import matplotlib.animation as animation
-from portmark import generate_coords, carton
+from portmark import generate_coords, carton, capture_names
+from telemetry import open_recording
+from rtde.csv_binary_reader import CSVBinaryReader
 mpl.rcParams['legend.fontsize'] = 10
 
 
@@ -37,113 +46,96 @@ def translation_matrix(offset, axis, rads, counter=False):
         ])
 
 
-def get_joint_data(df, dfi):
-    """given a dataframe, and index decipher joint position information. Note this isn't the nicest way to find fwd kinematics"""
-
-
-    # setup
-    base_axis, base_counter = 'z', False
-    shoulder_axis, shoulder_counter = 'y', True
-    elbow_axis, elbow_counter = 'y', True
-    w1_axis, w1_counter = 'y', True
-    w2_axis, w2_counter = 'z', True
-    w3_axis, w3_counter = 'y', True
-
-    # Represent the robot sections
-    origin = [0, 0, 0, 1] # x, y, z, _
-    base = [0, 0, 0.038, 1]
-    shoulder_vec_a = [0, 0, 0.0893, 1]
-    shoulder_vec_b = [0, -0.086, 0, 1]
-    elbow_vec_a = [0, -0.0303, 0, 1]
-    elbow_vec_b = [-0.612, 0, 0, 1]
-    w1_vec_a = [0, 0.006859, 0, 1]
-    w1_vec_b = [-0.5723, 0, 0, 1]
-    w2_vec_a = [0, -0.0545, 0, 1]
-    w2_vec_b = [0, 0, -0.0617, 1]
-    w3_vec_a = [0, 0, -0.054, 1]
-    w3_vec_b = [0, -0.06141, 0, 1]
-
-    # Represents the print head extension
-    flange_vec_a = [-0.12, 0, -0.038, 1]  # altered to tcp
-    flange_vec_b = [0, -0.18, 0, 1]  # altered to tcp
-
-    # Represents the printer head surface
-    print_vec_a = [0.05, 0, -0.025, 1]
-    print_vec_b = [-0.05, 0, 0.025, 1]
-
-    # Joints
-    base_rotation, shoulder_rotation, elbow_rotation, w1_rotation, w2_rotation, w3_rotation = df.iloc[dfi]
-
-    # Shoulder
-    tx = translation_matrix(base, base_axis, base_rotation, counter=base_counter)
-    shoulder_a = tx @ shoulder_vec_a
-    tx = tx @ translation_matrix(shoulder_vec_a, base_axis, 0, counter=base_counter)
-    shoulder_b = tx @ shoulder_vec_b
-
-    # Elbow
-    tx = tx @ translation_matrix(shoulder_vec_b, shoulder_axis, shoulder_rotation, counter=shoulder_counter)
-    elbow_a = tx @ elbow_vec_a
-    tx = tx @ translation_matrix(elbow_vec_a, shoulder_axis, 0, counter=shoulder_counter)
-    elbow_b = tx @ elbow_vec_b
-
-    # Wrist 1
-    tx = tx @ translation_matrix(elbow_vec_b, elbow_axis, elbow_rotation, counter=elbow_counter)
-    w1_a = tx @ w1_vec_a
-    tx = tx @ translation_matrix(w1_vec_a, elbow_axis, 0, counter=elbow_counter)
-    w1_b = tx @ w1_vec_b
-
-    # Wrist 2
-    tx = tx @ translation_matrix(w1_vec_b, w1_axis, w1_rotation, counter=w1_counter)
-    w2_a = tx @ w2_vec_a
-    tx = tx @ translation_matrix(w2_vec_a, w1_axis, 0, counter=w1_counter)
-    w2_b = tx @ w2_vec_b
-
-    # Wrist 3
-    tx = tx @ translation_matrix(w2_vec_b, w2_axis, w2_rotation, counter=w2_counter)
-    w3_a = tx @ w3_vec_a
-    tx = tx @ translation_matrix(w3_vec_a, w2_axis, 0, counter=w2_counter)
-    w3_b = tx @ w3_vec_b
-
-    # Printer extension
-    tx = tx @ translation_matrix(w3_vec_b, w3_axis, w3_rotation, counter=w3_counter)
-    flange_a = tx @ flange_vec_a
-    tx = tx @ translation_matrix(flange_vec_a, w3_axis, 0, counter=w3_counter)
-    flange_b = tx @ flange_vec_b
+# Represent the robot sections
+origin = [0, 0, 0, 1] # x, y, z, _
+base = [0, 0, 0.038, 1]
+shoulder_vec_a = [0, 0, 0.0893, 1]
+shoulder_vec_b = [0, -0.086, 0, 1]
+elbow_vec_a = [0, -0.0303, 0, 1]
+elbow_vec_b = [-0.612, 0, 0, 1]
+w1_vec_a = [0, 0.006859, 0, 1]
+w1_vec_b = [-0.5723, 0, 0, 1]
+w2_vec_a = [0, -0.0545, 0, 1]
+w2_vec_b = [0, 0, -0.0617, 1]
+w3_vec_a = [0, 0, -0.054, 1]
+w3_vec_b = [0, -0.06141, 0, 1]
+
+# Represents the print head extension
+flange_vec_a = [-0.12, 0, -0.038, 1]  # altered to tcp
+flange_vec_b = [0, -0.18, 0, 1]  # altered to tcp
+
+# Represents the printer head surface
+print_vec_a = [0.05, 0, -0.025, 1]
+print_vec_b = [-0.05, 0, 0.025, 1]
+
+# Each joint (axis, counter) rotates about the end of the previous section and carries the next one (a, b)
+joints = [
+    ('z', False, shoulder_vec_a, shoulder_vec_b),  # base
+    ('y', True, elbow_vec_a, elbow_vec_b),  # shoulder
+    ('y', True, w1_vec_a, w1_vec_b),  # elbow
+    ('y', True, w2_vec_a, w2_vec_b),  # w1
+    ('z', True, w3_vec_a, w3_vec_b),  # w2
+    ('y', True, flange_vec_a, flange_vec_b),  # w3, printer extension
+]
+
+# Where to represent the joints with a special scatter plot
+pivots = [
+    True, False,  # origin, base
+    True, False,  # shoulder
+    True, False,  # elbow
+    True, False,  # w1
+    True, False,  # w2
+    True, False,  # w3
+    False, False,  # print extension
+    False, False  # print surface
+]
+
+# rotation plane (i, j) per axis
+_planes = {'x': (1, 2), 'y': (2, 0), 'z': (0, 1)}
+
+
+def translation_matrices(offset, axis, rads):
+    """translation_matrix for an array of rotations, (N, 4, 4)"""
+    i, j = _planes[axis]
+    cos_r, sin_r = np.cos(rads), np.sin(rads)
+    tx = np.zeros((len(rads), 4, 4))
+    tx[:, 3 - i - j, 3 - i - j] = 1
+    tx[:, i, i] = cos_r
+    tx[:, j, j] = cos_r
+    tx[:, i, j] = -sin_r
+    tx[:, j, i] = sin_r
+    tx[:, :3, 3] = offset[:3]
+    tx[:, 3, 3] = 1
+    return tx
+
+
+def joint_positions(q):
+    """Forward kinematics for a whole run. Takes (N, 6) joint angles (q1..q6) and returns
+    the (N, 16, 3) points get_joint_data plots, joined in order"""
+    q = np.asarray(q, dtype=float).reshape(-1, 6)
+    points = np.empty((len(q), 16, 3))
+    points[:, 0] = origin[:3]
+    points[:, 1] = base[:3]
+
+    tx = np.broadcast_to(np.eye(4), (len(q), 4, 4))
+    offset = base
+    for n, (axis, counter, vec_a, vec_b) in enumerate(joints):
+        tx = tx @ translation_matrices(offset, axis, -q[:, n] if counter else q[:, n])
+        points[:, 2 + 2 * n] = (tx @ vec_a)[:, :3]
+        tx = tx @ translation_matrix(vec_a, 'z', 0)
+        points[:, 3 + 2 * n] = (tx @ vec_b)[:, :3]
+        offset = vec_b
 
     # Printer surface
     tx = tx @ translation_matrix(flange_vec_b, 'z', 0)
-    print_a = tx @ print_vec_a
-    print_b = tx @ print_vec_b
-
-    # join x y z
-    plots = [
-        origin, base,
-        shoulder_a, shoulder_b,
-        elbow_a, elbow_b,
-        w1_a, w1_b,
-        w2_a, w2_b,
-        w3_a, w3_b,
-        flange_a, flange_b,
-        print_a, print_b
-    ]
-
-    # Where to represent the joints with a special scatter plot
-    pivots = [
-        True, False,  # origin, base
-        True, False,  # shoulder
-        True, False,  # elbow
-        True, False,  # w1
-        True, False,  # w2
-        True, False,  # w3
-        False, False,  # print extension
-        False, False  # print surface
-    ]
-
-    joint_x = [p[0] for p in plots]
-    joint_y = [p[1] for p in plots]
-    joint_z = [p[2] for p in plots]
-
-    return np.array(joint_x), np.array(joint_y), np.array(joint_z), pivots
+    points[:, 14:] = np.einsum('nij,kj->nki', tx[:, :3], np.array([print_vec_a, print_vec_b], dtype=float))
+    return points
+
+
+def get_joint_data(df, dfi):
+    """given a dataframe, and index decipher joint position information, see joint_positions"""
+    joint = joint_positions(np.asarray(df.iloc[dfi], dtype=float))[0]
+    return joint[:, 0], joint[:, 1], joint[:, 2], pivots
 
 def get_pos_data(df, dfi):
     # setup
@@ -161,28 +153,273 @@ def get_path_print_data(df):
     return np.array((path_x, path_y, path_z)), np.array((print_x, print_y, print_z))
 
 
-if __name__ == "__main__":
-    pause = True
-    data = pd.read_csv("data.csv")
-
-    # joint
-    joint_df = data[["q1", "q2", "q3", "q4", "q5", "q6"]]
-    joint_x, joint_y, joint_z = np.array([]), np.array([]), np.array([])
+joint_cols = ["q1", "q2", "q3", "q4", "q5", "q6"]
+pos_cols = ["x", "y", "z"]
+speed_cols = ["vx", "vy", "vz", "wx", "wy", "wz"]
+
+# Bump when the frames or the kinematics change, older cached frames are then ignored
+FRAMES_VERSION = b"frames-1"
+
+
+def frames_key(filename):
+    """Hash of the recording contents"""
+    sha = hashlib.sha1(FRAMES_VERSION)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def compute_frames(filename, chunk_rows=4096):
+    """Every animation frame of a recording as contiguous arrays:
+    links (N, 16, 3), position (N, 3), speed (N, 6) and print (N,)"""
+    links, position, speed, prints = [], [], [], []
+    names = joint_cols + pos_cols + speed_cols + ["print"]
+    recording = open_recording(filename)
+    # a binary capture (data.bin) keeps the state recipe names, read them as the csv ones
+    capture = isinstance(recording, CSVBinaryReader)
+    for chunk in recording.iter_chunks([capture_names[name] for name in names] if capture else names, chunk_rows):
+        if capture:
+            chunk = rename_fields(chunk, {capture_names[name]: name for name in names})
+        links.append(joint_positions(structured_to_unstructured(chunk[joint_cols])).astype(np.float32))
+        position.append(structured_to_unstructured(chunk[pos_cols]))
+        speed.append(structured_to_unstructured(chunk[speed_cols]))
+        prints.append(chunk["print"].astype(bool))
+    if not links:
+        return {"links": np.empty((0, 16, 3), np.float32), "position": np.empty((0, 3)),
+                "speed": np.empty((0, 6)), "print": np.empty(0, bool)}
+    return {"links": np.concatenate(links), "position": np.concatenate(position),
+            "speed": np.concatenate(speed), "print": np.concatenate(prints)}
+
+
+def load_frames(filename, cache_dir=".frames_cache"):
+    """compute_frames, cached on disk by the recording hash. No cache_dir disables the cache"""
+    if not cache_dir:
+        return compute_frames(filename)
+    path = os.path.join(cache_dir, frames_key(filename) + ".npz")
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            return {name: cached[name] for name in cached.files}
+    frames = compute_frames(filename)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(path + ".tmp.npz", **frames)
+    os.replace(path + ".tmp.npz", path) # never leave half a cache behind
+    return frames
+
+
+joint_mask = np.array(pivots)
+
+# Most path (and print) points drawn, more are decimated
+POINT_BUDGET = 20000
+
+
+def decimate(position, prints=None, budget=POINT_BUDGET):
+    """Indices of at most about budget points of a path that keep its shape.
+    Consecutive points are bucketed, each bucket keeps its first and last point and
+    its extreme x, y and z. Every print on/off transition is kept on top"""
+    count = len(position)
+    if count <= budget or budget <= 0:
+        return np.arange(count)
+    buckets = max(1, budget // 8)
+    size = ceil(count / buckets)
+    starts = np.arange(0, count, size)
+    # pad with the last point to whole buckets, extremes in the padding fall back on it
+    padded = np.concatenate([position, np.repeat(position[-1:], len(starts) * size - count, axis=0)])
+    padded = padded.reshape(len(starts), size, 3)
+    keep = [starts, np.minimum(starts + size, count) - 1,
+            (padded.argmin(axis=1) + starts[:, None]).ravel(), (padded.argmax(axis=1) + starts[:, None]).ravel()]
+    if prints is not None:
+        switch = np.flatnonzero(prints[1:] != prints[:-1])
+        keep += [switch, switch + 1]
+    return np.unique(np.minimum(np.concatenate(keep), count - 1))
+
+
+class PathLOD():
+    """Path and print markers drawn at a point budget. When zoomed in, the part of
+    the run in view is decimated again, so detail comes back as the view narrows"""
+    def __init__(self, ax, position, prints, budget=POINT_BUDGET):
+        self.ax = ax
+        self.position = position
+        self.prints = prints
+        self.budget = budget
+        self.limits = None
+        self.path, = ax.plot(*self.path_points(0, len(position)).T, 'y--', label="path")
+        self.marks, = ax.plot(*self.print_points(0, len(position)).T, 'r.', label="prints")
+        for name in ('xlim_changed', 'ylim_changed', 'zlim_changed'):
+            # a plain function, callbacks only keep weak references to bound methods
+            ax.callbacks.connect(name, lambda ax: self.update())
+
+    def path_points(self, start, stop):
+        position = self.position[start:stop]
+        return position[decimate(position, self.prints[start:stop], self.budget)]
+
+    def print_points(self, start, stop):
+        printed = self.position[start:stop][self.prints[start:stop]]
+        return printed[decimate(printed, None, self.budget)]
+
+    def update(self):
+        """Decimates the span of the run in view"""
+        limits = (self.ax.get_xlim3d(), self.ax.get_ylim3d(), self.ax.get_zlim3d())
+        if limits == self.limits or not len(self.position):
+            return
+        self.limits = limits
+        lower, upper = np.array(limits).T
+        in_view = np.flatnonzero(((self.position >= lower) & (self.position <= upper)).all(axis=1))
+        if not len(in_view):
+            return
+        start, stop = max(in_view[0] - 1, 0), in_view[-1] + 2 # neighbours so lines leave the view
+        self.path.set_data_3d(*self.path_points(start, stop).T)
+        self.marks.set_data_3d(*self.print_points(start, stop).T)
+
+
+def plot_run(ax, frames, budget=POINT_BUDGET):
+    """Draws the path and prints, returns the robot line and joint markers to animate"""
+    ax.view_init(elev=-155, azim=-116)
+    ax.set_xlabel('X axis')
+    ax.set_ylabel('Y axis')
+    ax.set_zlabel('Z axis')
 
     # Where printing at
-    path_df = data[["x", "y", "z", "rx", "ry", "rz", "print"]]
-    path_xyz, print_xyz = get_path_print_data(path_df)
-    path_x, path_y, path_z = path_xyz
-    print_x, print_y, print_z = print_xyz
+    PathLOD(ax, frames["position"], frames["print"], budget)
+    ax.legend(bbox_to_anchor=(1.04,1), loc="upper left")
 
-    speed_df = data[["vx", "vy", "vz", "wx", "wy", "wz"]]
-    vx, vy, vz, wx, wy, wz = 0, 0, 0, 0, 0, 0
+    line, = ax.plot([0], [0], [0], 'b')
+    scat, = ax.plot([0], [0], [0], 'xb')
+    return line, scat
+
+
+def draw_frame(ax, line, scat, frames, frame):
+    """Moves the robot to a frame"""
+    joint = frames["links"][frame]
+    line.set_data(joint[:, 0], joint[:, 1])
+    line.set_3d_properties(joint[:, 2])
+
+    vx, vy, vz = frames["speed"][frame, :3]
+    ax.set(title=f"vx: {round(vx,2)}, vy: {round(vy, 2)}, vz: {round(vz, 2)}")
+    # x, y, z = frames["position"][frame]
+    # ax.set(title=f"x: {round(x,3)}, y: {round(y, 3)}, z: {round(z, 3)} \n" +
+    #              f"vx: {round(vx,2)}, vy: {round(vy, 2)}, vz: {round(vz, 2)}")
+
+    # the points which are joints
+    scat.set_data(joint[joint_mask, 0], joint[joint_mask, 1])
+    scat.set_3d_properties(joint[joint_mask, 2])
+
+
+def render_stem(filename):
+    """Output name of a recording, from its directory and its whole file name: day1/data.csv -> day1_data_csv,
+    so run.csv and run.bin, or the data.csv of two days, do not overwrite each other"""
+    path = os.path.abspath(filename)
+    parent = os.path.basename(os.path.dirname(path))
+    return "_".join(part for part in (parent, os.path.basename(path).replace(".", "_")) if part)
+
+
+def render_path(frames, filename, dpi=150, budget=POINT_BUDGET):
+    """Saves the path and print plot as an image, headless"""
+    plt.switch_backend("Agg")
+    fig = plt.figure(figsize=(8, 6))
+    line, scat = plot_run(fig.add_subplot(projection='3d'), frames, budget)
+    line.remove()
+    scat.remove()
+    fig.savefig(filename, dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+
+
+def _render_frames(job):
+    """Process pool worker, renders numbered frames to png"""
+    frames_file, frame_dir, numbered, dpi, budget = job
+    plt.switch_backend("Agg")
+    with np.load(frames_file) as cached:
+        frames = {name: cached[name] for name in cached.files}
+    fig = plt.figure(figsize=(8, 6))
+    ax = fig.add_subplot(projection='3d')
+    line, scat = plot_run(ax, frames, budget)
+    for number, frame in numbered:
+        draw_frame(ax, line, scat, frames, frame)
+        fig.savefig(os.path.join(frame_dir, f"frame_{number:06d}.png"), dpi=dpi)
+    plt.close(fig)
+    return len(numbered)
+
+
+def render_video(frames, filename, rate=125, speed=1.0, fps=25, workers=None, dpi=100, budget=POINT_BUDGET):
+    """Saves the robot animation as mp4 (needs ffmpeg) or gif, headless.
+    Frames are decimated to fps and rendered in parallel on a process pool"""
+    skip = max(1, ceil(rate * speed / fps))
+    numbered = list(enumerate(range(0, len(frames["links"]), skip)))
+    if not numbered:
+        raise ValueError("No frames to render")
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as frame_dir:
+        frames_file = os.path.join(frame_dir, "frames.npz")
+        np.savez(frames_file, **frames)
+        # contiguous runs of frames, a few per worker to balance the load
+        jobs = [(frames_file, frame_dir, [tuple(f) for f in part], dpi, budget)
+                for part in np.array_split(np.array(numbered), min(len(numbered), workers * 4))]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(_render_frames, jobs):
+                pass
+
+        frame_ms = 1000 * skip / (rate * speed)
+        pattern = os.path.join(frame_dir, "frame_%06d.png")
+        if filename.endswith(".gif"):
+            from PIL import Image
+            images = [pattern % number for number, _ in numbered]
+            first = Image.open(images[0])
+            first.save(filename, save_all=True, append_images=(Image.open(image) for image in images[1:]),
+                       duration=frame_ms, loop=0)
+        else:
+            try:
+                subprocess.run([mpl.rcParams['animation.ffmpeg_path'], "-y", "-loglevel", "error",
+                                "-framerate", str(1000 / frame_ms), "-i", pattern,
+                                "-pix_fmt", "yuv420p", filename], check=True)
+            except FileNotFoundError:
+                raise RuntimeError("ffmpeg is needed for " + filename + ", render a .gif instead")
+    return len(numbered)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Animate a recorded portmarking run, or render runs headless")
+    parser.add_argument("files", nargs="*", default=["data.csv"], help="recordings, data.csv, data.tlm or data.bin")
+    parser.add_argument("--rate", type=float, default=125, help="samples per second in the recording")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed, 1 is real time")
+    parser.add_argument("--skip", type=int, default=0, help="frames advanced per update, 0 picks one for the speed")
+    parser.add_argument("--min-interval", type=float, default=40, help="fastest redraw in ms the automatic skip assumes")
+    parser.add_argument("--no-cache", action="store_true", help="recompute the frames")
+    parser.add_argument("--headless", metavar="DIR", help="render each recording to DIR instead of showing a window")
+    parser.add_argument("--video", choices=["mp4", "gif"], help="with --headless, also render the animation")
+    parser.add_argument("--fps", type=float, default=25, help="video frame rate, frames are decimated to it")
+    parser.add_argument("--workers", type=int, default=None, help="processes rendering video frames")
+    parser.add_argument("--budget", type=int, default=POINT_BUDGET, help="most path points drawn, 0 draws all")
+    args = parser.parse_args()
+    cache_dir = None if args.no_cache else ".frames_cache"
+
+    if args.headless:
+        os.makedirs(args.headless, exist_ok=True)
+        stems = [os.path.join(args.headless, render_stem(file)) for file in args.files]
+        if len(set(stems)) != len(stems):
+            sys.exit("Recordings would render to the same files: " +
+                     ", ".join(file for file, stem in zip(args.files, stems) if stems.count(stem) > 1))
+        for file, stem in zip(args.files, stems):
+            frames = load_frames(file, cache_dir=cache_dir)
+            render_path(frames, stem + "_path.png", budget=args.budget)
+            print("Rendered", stem + "_path.png")
+            if args.video:
+                count = render_video(frames, stem + "." + args.video, args.rate, args.speed, args.fps, args.workers,
+                                     budget=args.budget)
+                print("Rendered", stem + "." + args.video, count, "frames")
+        sys.exit()
+
+    pause = True
+    frames = load_frames(args.files[0], cache_dir=cache_dir)
+    links = frames["links"]
+
+    # Real time needs a frame every 1 / rate seconds, skip frames when redrawing can not keep up
+    skip = args.skip or max(1, ceil(args.min_interval * args.rate * args.speed / 1000))
+    interval = 1000 * skip / (args.rate * args.speed)
+    print(f"{len(links)} frames, showing every {skip} at {interval:.0f} ms")
 
     fig = plt.figure()
-    ax = fig.gca(projection='3d')
-    ax.view_init(elev=-155, azim=-116)
-    ax.plot(path_x, path_y, path_z, 'y--', label="path")
-    ax.plot(print_x, print_y, print_z, 'r.', label="prints")
+    ax = fig.add_subplot(projection='3d')
+    line, scat = plot_run(ax, frames, args.budget)
 
     # Coords stack coords
     def getpcs(cartonpos):
@@ -208,9 +445,6 @@ if __name__ == "__main__":
     #
     #     ax.scatter(x1+x2+x3, y1+y2+y3, z1+z2+z3, **kwargs, label=f"Side {side}\n areas")
 
-    line, = ax.plot([0], [0], [0], 'b')
-    scat, = ax.plot([0], [0], [0], 'xb')
-
     def onClick(event):
         if event.dblclick:
             global pause
@@ -219,36 +453,19 @@ if __name__ == "__main__":
 
     def data_gen():
         cnt = 0
-        while cnt < len(joint_df):
-            yield get_joint_data(joint_df, cnt), get_speed_data(speed_df, cnt), get_pos_data(path_df, cnt)
+        while cnt < len(links):
+            yield cnt
             if not pause:
-                cnt += 1
+                cnt += skip
 
     def init():
-        ax.set_xlabel('X axis')
-        ax.set_ylabel('Y axis')
-        ax.set_zlabel('Z axis')
-        line.set_data(joint_x, joint_y)
-        line.set_3d_properties(joint_z)
         return line,
 
-    def run(data):
+    def run(frame):
         # update the data
-        (joint_x, joint_y, joint_z, isjoint), (vx, vy, vz, wx, wy, wz), (x, y, z) = data
-        line.set_data(joint_x, joint_y)
-        line.set_3d_properties(joint_z)
-
-        ax.set(title=f"vx: {round(vx,2)}, vy: {round(vy, 2)}, vz: {round(vz, 2)}")
-        # ax.set(title=f"x: {round(x,3)}, y: {round(y, 3)}, z: {round(z, 3)} \n" +
-        #              f"vx: {round(vx,2)}, vy: {round(vy, 2)}, vz: {round(vz, 2)}")
-
-        # get the points which are joints
-        joint_x, joint_y, joint_z = np.array(list((zip(*[(x, y, z) for x, y, z, t in zip(joint_x, joint_y, joint_z, isjoint) if t]))))
-        scat.set_data(joint_x, joint_y)
-        scat.set_3d_properties(joint_z)
+        draw_frame(ax, line, scat, frames, frame)
         return line,
 
-    ax.legend(bbox_to_anchor=(1.04,1), loc="upper left")
     fig.canvas.mpl_connect('button_press_event', onClick)
-    ani = animation.FuncAnimation(fig, run, data_gen, interval=1, blit=False, init_func=init)
+    ani = animation.FuncAnimation(fig, run, data_gen, interval=interval, blit=False, init_func=init)
     fig.show()
\ No newline at end of file
@@ -0,0 +1,93 @@
+# Copyright (c) 2016, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import numpy as np
+import logging
+
+from .rtde import LOGNAME
+from . import serialize
+from .csv_reader import runtime_state, runtime_state_running, CHUNK_ROWS
+from numpy.lib import recfunctions
+
+_log = logging.getLogger(LOGNAME)
+
+
+class CSVBinaryReader(object):
+    """Reads a CSVBinaryWriter log by memory mapping it as a NumPy structured array.
+
+    Columns are attributes like CSVReader, but stay views on the file until used.
+    A trailing partial row (a capture cut short) is ignored.
+    """
+    __samples = None
+    __filename = None
+    def __init__(self, binfile, delimiter=' ', filter_running_program=False):
+        self.__filename = binfile.name
+
+        header = binfile.readline().decode('utf-8').split(delimiter)
+        types = binfile.readline().decode('utf-8').split(delimiter)
+        header = [name.strip() for name in header]
+        types = [t.strip() for t in types]
+        if len(header) != len(types):
+            raise ValueError('Header names and types do not match in file: ' + self.__filename)
+        offset = binfile.tell()
+
+        self.dtype = np.dtype([(name, serialize.NUMPY_TYPES[t]) for name, t in zip(header, types)])
+        binfile.seek(0, 2)
+        rows = (binfile.tell() - offset) // self.dtype.itemsize
+        if rows:
+            data = np.memmap(self.__filename, dtype=self.dtype, mode='r', offset=offset, shape=(rows,))
+        else:
+            data = np.empty(0, dtype=self.dtype)
+
+        if len(data)==0:
+            _log.warning('No data read from file: ' + self.__filename)
+
+        # filter data
+        if filter_running_program:
+            if runtime_state not in header:
+                _log.warning('Unable to filter data since runtime_state field is missing in data set')
+            else:
+                data = data[data[runtime_state] == int(runtime_state_running)]
+
+        self.data = data
+        self.__samples = len(data)
+
+        if self.__samples == 0:
+            _log.warning('No data left from file: ' + self.__filename + ' after filtering')
+
+        self.__dict__.update({name: data[name] for name in header})
+
+    def iter_chunks(self, names=None, chunk_rows=CHUNK_ROWS):
+        """Yields packed copies of chunk_rows rows (the last may be shorter) with the named columns, all by default"""
+        names = list(dict.fromkeys(names)) if names else list(self.dtype.names)
+        for name in names:
+            if name not in self.dtype.names:
+                raise ValueError('Unknown column: ' + name)
+        return (recfunctions.repack_fields(self.data[start:start + chunk_rows][names])
+                for start in range(0, self.__samples, chunk_rows))
+
+    def get_samples(self):
+        return self.__samples
+
+    def get_name(self):
+        return self.__filename
@@ -28,7 +28,13 @@ import struct
 from rtde import serialize
 
 class CSVBinaryWriter(object):
-    
+    """Binary log of data packages.
+
+    The header is two text lines, the column names and the column types, written
+    once by writeheader(). Each row is the big-endian field data of one package,
+    as returned by RTDE.receive(binary=True), so raw payloads are appended as is.
+    See csv_binary_reader.CSVBinaryReader.
+    """
     def __init__(self, file, names, types, delimiter=' '):
         if len(names) != len(types):
             raise ValueError('List sizes are not identical.')
@@ -48,7 +54,13 @@ class CSVBinaryWriter(object):
             else:
                 name = self.__names[i]
                 self.__header_names.append(name)
-    
+        self.__struct = struct.Struct('>' + ''.join(serialize.STRUCT_TYPES[t] for t in self.__types))
+        self.__vectors = tuple(serialize.get_item_size(t) > 1 for t in self.__types)
+
+    @property
+    def row_size(self):
+        return self.__struct.size
+
     def getType(self, vtype):
         if(vtype == 'VECTOR3D'):
             return "DOUBLE" + self.__delimiter + "DOUBLE" + self.__delimiter + "DOUBLE"
@@ -61,57 +73,38 @@ class CSVBinaryWriter(object):
         else:
             return str(vtype)
 
-
     def writeheader(self):
         #Header names
-        headerStr=str("")
-        for i in range(len(self.__header_names)):
-            if(i != 0):
-                headerStr += self.__delimiter
-
-            headerStr += self.__header_names[i]
-
-        headerStr += "\n"
-        self.__file.write(struct.pack(str(len(headerStr)) + 's', headerStr))
+        headerStr = self.__delimiter.join(self.__header_names) + "\n"
+        self.__file.write(headerStr.encode('utf-8'))
 
         #Header types
-        typeStr=str("")
-        for i in range(len(self.__names)):
-            if(i != 0):
-                typeStr += self.__delimiter
+        typeStr = self.__delimiter.join(self.getType(t) for t in self.__types) + "\n"
+        self.__file.write(typeStr.encode('utf-8'))
 
-            typeStr += self.getType(self.__types[i])
-
-        typeStr += "\n"
-        self.__file.write(struct.pack(str(len(typeStr)) + 's', typeStr))
-
-    
-    def packToBinary(self, vtype, value):
-        print(vtype)
-        if(vtype == 'BOOL'):
-            print("isBOOL" + str(value))
-        if(vtype == 'UINT8'):
-            print("isUINT8" + str(value))
-        elif(vtype == 'INT32'):
-            print("isINT32" + str(value))
-        elif(vtype == 'INT64'):
-            print("isINT64" + str(value))
-        elif(vtype == 'UINT32'):
-            print("isUINT32" + str(value))
-        elif(vtype == 'UINT64'):
-            print("isUINT64" + str(value))
-        elif(vtype == 'DOUBLE'):
-            print("isDOUBLE" + str(value) + str(type(value)) + str(sys.getsizeof(value)))
-        elif(vtype == 'VECTOR3D'):
-            print("isVECTOR3D" + str(value[0]) + ","+ str(value[1]) + ","+ str(value[2]))
-        elif(vtype == 'VECTOR6D'):
-            print("isVECTOR6D" + str(value[0]) + ","+ str(value[1]) + ","+ str(value[2]) + ","+ str(value[3]) + ","+ str(value[4]) + ","+ str(value[5]))
-        elif(vtype == 'VECTOR6INT32'):
-            print("isVECTOR6INT32" + str(value[0]) + ","+ str(value[1]) + ","+ str(value[2]) + ","+ str(value[3]) + ","+ str(value[4]) + ","+ str(value[5]))
-        elif(vtype == 'VECTOR6UINT32'):
-            print("isVECTOR6UINT32" + str(value[0]) + ","+ str(value[1]) + ","+ str(value[2]) + ","+ str(value[3]) + ","+ str(value[4]) + ","+ str(value[5]))
+    def packToBinary(self, data_object):
+        """Packs the fields of a data object into one row"""
+        values = []
+        for name, vector in zip(self.__names, self.__vectors):
+            value = getattr(data_object, name)
+            if vector:
+                values.extend(value)
+            else:
+                values.append(value)
+        return self.__struct.pack(*values)
 
     def writerow(self, data_object):
-        self.__file.write(data_object)
+        """Append one package, either the raw payload bytes or a data object"""
+        if isinstance(data_object, (bytes, bytearray, memoryview)):
+            if len(data_object) != self.__struct.size:
+                raise ValueError('Payload size ' + str(len(data_object)) + ' does not match row size ' + str(self.__struct.size))
+            self.__file.write(data_object)
+        else:
+            self.__file.write(self.packToBinary(data_object))
 
-    
\ No newline at end of file
+    def writerows(self, payloads):
+        """Append raw payloads in one write"""
+        data = b''.join(payloads)
+        if len(data) % self.__struct.size:
+            raise ValueError('Payloads do not match row size ' + str(self.__struct.size))
+        self.__file.write(data)
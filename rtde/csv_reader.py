@@ -22,6 +22,7 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import csv
+import mmap
 import numpy as np
 import logging
 
@@ -33,45 +34,155 @@ _log = logging.getLogger(LOGNAME)
 runtime_state = 'runtime_state'
 runtime_state_running = '2'
 
+CHUNK_SIZE = 4 * 1024 * 1024 # bytes of the file parsed at a time
+CHUNK_ROWS = 65536
+
+
+def rechunk(arrays, chunk_rows=CHUNK_ROWS):
+    """Regroups a stream of arrays into arrays of chunk_rows rows, the last one may be shorter"""
+    pending = []
+    count = 0
+    for array in arrays:
+        while len(array):
+            take = min(chunk_rows - count, len(array))
+            pending.append(array[:take])
+            count += take
+            array = array[take:]
+            if count == chunk_rows:
+                yield pending[0] if len(pending) == 1 else np.concatenate(pending)
+                pending = []
+                count = 0
+    if count:
+        yield pending[0] if len(pending) == 1 else np.concatenate(pending)
+
+
 class CSVReader(object):
+    """Reads a CSVWriter file lazily.
+
+    The file is memory mapped and only scanned for its row count (and the
+    runtime_state column when filtering) up front. A column is parsed into a
+    float array the first time its attribute is accessed, a chunk at a time, so
+    peak memory stays near the size of the columns used. load() parses several
+    columns in one pass, iter_chunks() streams rows without keeping them.
+    Columns written as True/False (e.g. portmark's print bit) parse as bool.
+    """
     __samples = None
     __filename = None
+    __header = None
     def get_header_data(self,__reader):
         header = next(__reader)
         return header
 
     def __init__(self, csvfile, delimiter = ' ', filter_running_program=False):
         self.__filename = csvfile.name
-
-        csvfile = [csvfile for csvfile in csvfile.readlines() if csvfile.strip()] # remove any empty lines
-
-        reader = csv.reader(csvfile, delimiter=delimiter)
-        header = self.get_header_data(reader)
-
-        # read csv file
-        data = [row for row in reader]
-
-        if len(data)==0:
-            _log.warn('No data read from file: ' + self.__filename)
+        self.__delimiter = delimiter
+        self.__mask = None
+
+        with open(self.__filename, 'rb') as f:
+            line = f.readline()
+            while line and not line.strip(): # skip any empty lines
+                line = f.readline()
+            self.__data_offset = f.tell()
+            first = f.readline()
+            while first and not first.strip():
+                first = f.readline()
+        self.__header = self.get_header_data(csv.reader([line.decode('utf-8').strip()], delimiter=delimiter))
+        values = first.decode('utf-8').strip().split(delimiter)
+        self.__bools = {name for name, value in zip(self.__header, values) if value in ('True', 'False')}
+
+        self.__rows = sum(len(lines) for lines in self.__chunks())
+        self.__samples = self.__rows
+
+        if self.__rows==0:
+            _log.warning('No data read from file: ' + self.__filename)
 
         # filter data
         if filter_running_program:
-            if runtime_state not in header:
-                _log.warn('Unable to filter data since runtime_state field is missing in data set')
+            if runtime_state not in self.__header:
+                _log.warning('Unable to filter data since runtime_state field is missing in data set')
             else:
-                idx = header.index(runtime_state)
-                data = [row for row in data if row[idx] == runtime_state_running]
-
-        self.__samples = len(data)
+                state, = self.__parse([runtime_state])
+                self.__mask = state == float(runtime_state_running)
+                self.__samples = int(np.count_nonzero(self.__mask))
 
         if self.__samples == 0:
-            _log.warn('No data left from file: ' + self.__filename + ' after filtering')
-
-        # transpose data
-        data = list(zip(*data))
-
-        # create dictionary from  header elements (keys) to float arrays
-        self.__dict__.update({header[i]: np.array(list(map(float, data[:][i]))) for i in range(len(header))})
+            _log.warning('No data left from file: ' + self.__filename + ' after filtering')
+
+    def __chunks(self):
+        """Yields the non empty data lines, a chunk of whole lines at a time"""
+        with open(self.__filename, 'rb') as f:
+            if f.seek(0, 2) <= self.__data_offset:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start, size = self.__data_offset, len(mm)
+                while start < size:
+                    end = min(start + CHUNK_SIZE, size)
+                    if end < size:
+                        newline = mm.find(b'\n', end - 1)
+                        end = size if newline < 0 else newline + 1
+                    yield [line for line in mm[start:end].decode('utf-8').splitlines() if line.strip()]
+                    start = end
+
+    def __parse_lines(self, lines, names):
+        """Parses the named columns of some lines into a structured array"""
+        usecols = [self.__header.index(name) for name in names]
+        bools = [name for name in names if name in self.__bools]
+        values = np.loadtxt(lines, delimiter=self.__delimiter, usecols=usecols, ndmin=1,
+                            dtype=[(name, 'U5' if name in bools else 'f8') for name in names])
+        if not bools:
+            return values
+        parsed = np.empty(len(values), dtype=[(name, '?' if name in bools else 'f8') for name in names])
+        for name in names:
+            parsed[name] = values[name] == 'True' if name in bools else values[name]
+        return parsed
+
+    def __parsed_chunks(self, names):
+        """Yields the named columns a chunk at a time, filtered"""
+        mask = self.__mask
+        chunk_row = 0
+        for lines in self.__chunks():
+            if not lines:
+                continue
+            values = self.__parse_lines(lines, names)
+            if mask is not None:
+                values = values[mask[chunk_row:chunk_row + len(values)]]
+                chunk_row += len(lines)
+            yield values
+
+    def __parse(self, names):
+        """Parses columns into float arrays in one pass, bool arrays for True/False columns"""
+        columns = [np.empty(self.__samples, dtype=bool if name in self.__bools else float) for name in names]
+        row = 0
+        for values in self.__parsed_chunks(names):
+            for column, name in zip(columns, names):
+                column[row:row + len(values)] = values[name]
+            row += len(values)
+        return columns
+
+    def iter_chunks(self, names=None, chunk_rows=CHUNK_ROWS):
+        """Yields structured arrays of chunk_rows rows (the last may be shorter) with the named columns, all by default.
+        Rows are parsed as they are yielded, nothing is kept"""
+        names = list(dict.fromkeys(names)) if names else list(self.__header)
+        for name in names:
+            if name not in self.__header:
+                raise ValueError('Unknown column: ' + name)
+        return rechunk(self.__parsed_chunks(names), chunk_rows)
+
+    def __getattr__(self, name):
+        # only called for columns not parsed yet
+        if name.startswith('_') or self.__header is None or name not in self.__header:
+            raise AttributeError(name)
+        return self.load(name)[0]
+
+    def load(self, *names):
+        """Parses the named columns not parsed yet, returns all of them"""
+        missing = [name for name in dict.fromkeys(names) if name not in self.__dict__]
+        if missing:
+            self.__dict__.update(zip(missing, self.__parse(missing)))
+        return [self.__dict__[name] for name in names]
+
+    def get_header(self):
+        return list(self.__header)
 
     def get_samples(self):
         return self.__samples
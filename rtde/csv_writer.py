@@ -56,7 +56,7 @@ class CSVWriter(object):
         data = []
         for i in range(len(self.__names)):
             size = serialize.get_item_size(self.__types[i])
-            value = data_object.__dict__[self.__names[i]]
+            value = getattr(data_object, self.__names[i])
             if size > 1:
                 data.extend(value)
             else:
@@ -26,6 +26,10 @@ import socket
 import select
 import sys
 import logging
+import bisect
+import collections
+import threading
+import time
 
 if sys.version_info[0] < 3:
   import serialize
@@ -33,6 +37,9 @@ else:
   from rtde import serialize
 
 DEFAULT_TIMEOUT = 1.0
+RECV_BUFFER_SIZE = 65536 # initial receive buffer size, grows if a packet does not fit
+SEND_QUEUE_LIMIT = 65536 # queued outbound bytes above which backpressure is signalled
+WRITE_LATENCY_BUCKETS_US = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 100000) # upper bounds, plus overflow
 
 LOGNAME = 'rtde'
 _log = logging.getLogger(LOGNAME)
@@ -70,22 +77,56 @@ class RTDE(object):
         self.__conn_state = ConnectionState.DISCONNECTED
         self.__sock = None
         self.__output_config = None
+        self.__output_object = None
+        self.__reuse_output = False
         self.__input_config = {}
         self.__skipped_package_count = 0
+        self.__received_package_count = 0
+        self.__consumed_package_count = 0
+        self.__sent_package_count = 0
+        self.__coalesced_package_count = 0
+        self.__suppressed_package_count = 0
+        self.__marked = {}
+        self.__last_sent = None # recipe id -> (payload, time sent), see suppress_unchanged()
+        self.__refresh_period = None
+        self.__outbound = collections.deque() # [buf, time queued], written in order
+        self.__outbound_bytes = 0
+        self.__last_progress = 0.0 # when the kernel last took queued bytes
+        self.__send_lock = threading.Lock() # the receiver thread drains too
+        self.__write_latency = [0] * (len(WRITE_LATENCY_BUCKETS_US) + 1)
+        self.__recorded = None
+        self.__record_binary = False
         self.__protocolVersion = RTDE_PROTOCOL_VERSION_1
 
     def connect(self):
         if self.__sock:
             return
 
-        self.__buf = b'' # buffer data in binary format
+        # preallocated receive buffer, unread data lives in [buf_start, buf_end)
+        self.__buf = bytearray(RECV_BUFFER_SIZE)
+        self.__view = memoryview(self.__buf)
+        self.__buf_start = 0
+        self.__buf_end = 0
         try:
             self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.__sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self.__sock.settimeout(DEFAULT_TIMEOUT)
             self.__skipped_package_count = 0
+            self.__received_package_count = 0
+            self.__consumed_package_count = 0
+            self.__sent_package_count = 0
+            self.__coalesced_package_count = 0
+            self.__suppressed_package_count = 0
+            self.__marked = {}
+            if self.__last_sent is not None:
+                self.__last_sent = {} # the controller starts from scratch
+            self.__outbound.clear()
+            self.__outbound_bytes = 0
+            self.__write_latency = [0] * (len(WRITE_LATENCY_BUCKETS_US) + 1)
             self.__sock.connect((self.hostname, self.port))
+            # writes never block, what the kernel does not take is queued, see __write()
+            self.__sock.setblocking(False)
             self.__conn_state = ConnectionState.CONNECTED
         except (socket.timeout, socket.error):
             self.__sock = None
@@ -95,6 +136,8 @@ class RTDE(object):
 
     def disconnect(self):
         if self.__sock:
+            if self.__outbound_bytes:
+                _log.warning('%d bytes not sent on disconnect', self.__outbound_bytes)
             self.__sock.close()
             self.__sock = None
         self.__conn_state = ConnectionState.DISCONNECTED
@@ -132,9 +175,11 @@ class RTDE(object):
             return None
         result.names = variables
         self.__input_config[result.id] = result
-        return serialize.DataObject.create_empty(variables, result.id)
+        return result.data_class(result.id)
 
-    def send_output_setup(self, variables, types=[], frequency=125):
+    def send_output_setup(self, variables, types=[], frequency=125, reuse=False):
+        """Setup the output recipe. With reuse, receive() updates and returns the same
+        object every time, so callers must copy any vector they keep."""
         cmd = Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS
         payload = struct.pack('>d', frequency)
         payload = payload + (','.join(variables).encode('utf-8'))
@@ -146,6 +191,8 @@ class RTDE(object):
             return False
         result.names = variables
         self.__output_config = result
+        self.__output_object = None
+        self.__reuse_output = reuse
         return True
 
     def send_start(self):
@@ -176,7 +223,59 @@ class RTDE(object):
             _log.error('Input configuration id not found: ' + str(input_data.recipe_id))
             return
         config = self.__input_config[input_data.recipe_id]
-        return self.__sendall(Command.RTDE_DATA_PACKAGE, config.pack(input_data))
+        payload = config.pack(input_data)
+        if self.__unchanged(input_data.recipe_id, payload):
+            return True
+        self.__sent_package_count += 1
+        return self.__sendall(Command.RTDE_DATA_PACKAGE, payload)
+
+    def suppress_unchanged(self, enabled=True, refresh_period=None):
+        """Skip input packages identical to the last one sent for their recipe, in send() and flush().
+        With a refresh_period (seconds) an unchanged package is still sent when the last send of
+        its recipe is older than that"""
+        self.__last_sent = {} if enabled else None
+        self.__refresh_period = refresh_period
+
+    def __unchanged(self, recipe_id, payload):
+        """Whether a package can be skipped, otherwise remembers it as the last sent"""
+        if self.__last_sent is None:
+            return False
+        now = time.monotonic()
+        last = self.__last_sent.get(recipe_id)
+        if last is not None and last[0] == payload and (self.__refresh_period is None or now - last[1] < self.__refresh_period):
+            self.__suppressed_package_count += 1
+            return True
+        self.__last_sent[recipe_id] = (payload, now)
+        return False
+
+    def mark(self, input_data):
+        """Like send(), but the package is only packed now and sent by the next flush(), together with
+        the other marked ones. A recipe marked again before the flush is sent once, with the latest values,
+        at its latest place: the controller applies the packages in the order they were last marked"""
+        if self.__conn_state != ConnectionState.STARTED:
+            _log.error('Cannot send when RTDE synchronization is inactive')
+            return False
+        if not input_data.recipe_id in self.__input_config:
+            _log.error('Input configuration id not found: ' + str(input_data.recipe_id))
+            return False
+        config = self.__input_config[input_data.recipe_id]
+        self.__marked.pop(input_data.recipe_id, None) # move it to the end
+        self.__marked[input_data.recipe_id] = config.pack(input_data)
+        return True
+
+    def flush(self):
+        """Send the marked packages in one write, in the order last marked"""
+        # compared here, not in mark(), as a recipe may be marked again back to its last sent values
+        payloads = [payload for recipe_id, payload in self.__marked.items() if not self.__unchanged(recipe_id, payload)]
+        self.__marked = {}
+        if not payloads:
+            return True
+        header = serialize.HEADER
+        buf = b''.join(header.pack(header.size + len(payload), Command.RTDE_DATA_PACKAGE) + payload
+                       for payload in payloads)
+        self.__sent_package_count += len(payloads)
+        self.__coalesced_package_count += len(payloads) - 1
+        return self.__write(buf)
 
     def receive(self, binary=False):
         if self.__output_config is None:
@@ -185,6 +284,39 @@ class RTDE(object):
             raise RTDEException('Cannot receive when RTDE synchronization is inactive')
         return self.__recv(Command.RTDE_DATA_PACKAGE, binary)
 
+    def receive_batch(self):
+        """Receive every data package available as one NumPy structured array (see DataConfig.dtype).
+
+        Blocks until at least one package arrives, no package is skipped. Returns None on timeout.
+        """
+        if self.__output_config is None:
+            raise RTDEException('Output configuration not initialized')
+        if self.__conn_state != ConnectionState.STARTED:
+            raise RTDEException('Cannot receive when RTDE synchronization is inactive')
+        return self.__recv_batch()
+
+    def start_recording(self, binary=False):
+        """Keep every received data package instead of skipping to the latest, see take_recorded().
+        Binary records the raw payloads, as receive(binary=True), without decoding them"""
+        # the mode first, a receiver thread may see the list as soon as it is set
+        self.__record_binary = binary
+        if self.__recorded is None:
+            self.__recorded = []
+
+    def stop_recording(self):
+        """Stop recording, returns the packages not yet taken"""
+        recorded = self.take_recorded()
+        self.__recorded = None
+        return recorded
+
+    def take_recorded(self):
+        """Returns the (sequence, data) packages recorded since the last call, sequence counts from connect"""
+        recorded = self.__recorded
+        if recorded is None:
+            return []
+        self.__recorded = []
+        return recorded
+
     def send_message(self, message, source = "Python Client", type = serialize.Message.INFO_MESSAGE):
         cmd = Command.RTDE_TEXT_MESSAGE
         fmt = '>B%dsB%dsB' % (len(message), len(source))
@@ -221,18 +353,58 @@ class RTDE(object):
         fmt = '>HB'
         size = struct.calcsize(fmt) + len(payload)
         buf = struct.pack(fmt, size, command) + payload
+        return self.__write(buf)
 
+    def __write(self, buf):
+        """One send syscall at most, no select. What the kernel does not take now is queued and
+        drained by later writes and receives. False when the connection is lost"""
         if self.__sock is None:
             _log.error('Unable to send: not connected to Robot')
             return False
 
-        _, writable, _ = select.select([], [self.__sock], [], DEFAULT_TIMEOUT)
-        if len(writable):
-            self.__sock.sendall(buf)
-            return True
-        else:
-            self.__trigger_disconnected()
-            return False
+        with self.__send_lock:
+            if not self.__outbound:
+                self.__last_progress = time.perf_counter()
+            self.__outbound.append([buf, time.perf_counter()])
+            self.__outbound_bytes += len(buf)
+            if len(self.__outbound) == 1:
+                self.__drain()
+            if self.__outbound_bytes > SEND_QUEUE_LIMIT:
+                _log.warning('%d bytes waiting to be sent', self.__outbound_bytes)
+        return self.__sock is not None
+
+    def __drain(self):
+        """Writes queued buffers until the kernel stops taking them, the send lock held"""
+        while self.__outbound and self.__sock is not None:
+            entry = self.__outbound[0]
+            buf, queued = entry
+            try:
+                sent = self.__sock.send(buf)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError as e:
+                _log.error('Unable to send: ' + str(e))
+                self.__trigger_disconnected()
+                return
+            self.__outbound_bytes -= sent
+            now = time.perf_counter()
+            if sent:
+                self.__last_progress = now
+            if sent < len(buf):
+                entry[0] = memoryview(buf)[sent:]
+                # no byte taken for as long as the old select timeout, the controller is gone
+                if now - self.__last_progress > DEFAULT_TIMEOUT:
+                    _log.error('Unable to send for %d seconds', DEFAULT_TIMEOUT)
+                    self.__trigger_disconnected()
+                return
+            self.__outbound.popleft()
+            latency_us = 1e6 * (now - queued)
+            self.__write_latency[bisect.bisect_left(WRITE_LATENCY_BUCKETS_US, latency_us)] += 1
+
+    def __drain_pending(self):
+        if self.__outbound and self.__sock is not None:
+            with self.__send_lock:
+                self.__drain()
 
     def has_data(self):
         timeout = 0
@@ -241,38 +413,57 @@ class RTDE(object):
 
     def __recv(self, command, binary=False):
         while self.is_connected():
+            self.__drain_pending()
+            if not self.is_connected(): # a failed send disconnects
+                continue
             readable, _, xlist = select.select([self.__sock], [], [self.__sock], DEFAULT_TIMEOUT)
             if len(readable):
-                more = self.__sock.recv(4096)
-                #When the controller stops while the script is running
-                if len(more) == 0:
-                    _log.error('received 0 bytes from Controller, probable cause: Controller has stopped')
-                    self.__trigger_disconnected()  
-                    raise RTDEException('received 0 bytes from Controller')
-
-                self.__buf = self.__buf + more
+                self.__recv_into_buffer()
 
             if len(xlist) or len(readable) == 0: # Effectively a timeout of DEFAULT_TIMEOUT seconds
                 _log.warning('no data received in last %d seconds ',DEFAULT_TIMEOUT)
                 return None
 
             # unpack_from requires a buffer of at least 3 bytes
-            while len(self.__buf) >= 3:
-                # Attempts to extract a packet
-                packet_header = serialize.ControlHeader.unpack(self.__buf)
-
-                if len(self.__buf) >= packet_header.size:
-                    packet, self.__buf = self.__buf[3:packet_header.size], self.__buf[packet_header.size:]
-                    data = self.__on_packet(packet_header.command, packet)
-                    if len(self.__buf) >= 3 and command == Command.RTDE_DATA_PACKAGE:
-                        next_packet_header = serialize.ControlHeader.unpack(self.__buf)
-                        if next_packet_header.command == command:
-                            _log.debug('skipping package(1)')
-                            self.__skipped_package_count += 1
+            while self.__buf_end - self.__buf_start >= 3:
+                # Attempts to extract a packet, in place
+                start = self.__buf_start
+                packet_size, packet_command = serialize.HEADER.unpack_from(self.__buf, start)
+
+                if self.__buf_end - start >= packet_size:
+                    end = start + packet_size
+                    self.__buf_start = end
+                    if packet_command == Command.RTDE_DATA_PACKAGE:
+                        sequence = self.__received_package_count
+                        self.__received_package_count += 1
+                        latest = command == Command.RTDE_DATA_PACKAGE
+                        if latest and self.__buf_end - end >= 3:
+                            _, next_packet_command = serialize.HEADER.unpack_from(self.__buf, end)
+                            latest = next_packet_command != command
+                        data = None
+                        if self.__recorded is not None and self.__record_binary:
+                            self.__recorded.append((sequence, bytes(self.__view[start + 4:end])))
+                        elif self.__recorded is not None:
+                            # fresh object per package, the recording keeps them
+                            data = self.__output_config.unpack(self.__buf, start + 3)
+                            self.__recorded.append((sequence, data))
+                        if not latest:
+                            if self.__recorded is None:
+                                _log.debug('skipping package(1)' if command == packet_command else 'skipping package(2)')
+                                self.__skipped_package_count += 1
                             continue
-                    if packet_header.command == command:
+                        self.__consumed_package_count += 1
                         if(binary):
-                            return packet[1:]
+                            return bytes(self.__view[start + 4:end])
+                        if data is not None:
+                            return data
+
+                        return self.__unpack_data_package(self.__buf, self.__output_config, start + 3)
+
+                    data = self.__on_packet(packet_command, bytes(self.__view[start + 3:end]))
+                    if packet_command == command:
+                        if(binary):
+                            return bytes(self.__view[start + 4:end])
 
                         return data
                     else:
@@ -281,6 +472,68 @@ class RTDE(object):
                     break
         raise RTDEException(' _recv() Connection lost ')
 
+    def __recv_batch(self):
+        batches = []
+        while self.is_connected():
+            self.__drain_pending()
+            if not self.is_connected(): # a failed send disconnects
+                continue
+            while self.__buf_end - self.__buf_start >= 3:
+                start = self.__buf_start
+                packet_size, packet_command = serialize.HEADER.unpack_from(self.__buf, start)
+                if self.__buf_end - start < packet_size:
+                    break
+                if packet_command == Command.RTDE_DATA_PACKAGE:
+                    # decode the run of complete data packages in one go
+                    batch, count = self.__output_config.unpack_packets(self.__buf, start, self.__buf_end, packet_command)
+                    if count:
+                        self.__received_package_count += count
+                        self.__consumed_package_count += count
+                        batches.append(batch)
+                        self.__buf_start = start + count * packet_size
+                        continue
+                self.__buf_start = start + packet_size
+                self.__on_packet(packet_command, bytes(self.__view[start + 3:start + packet_size]))
+
+            # once something is decoded only take what is already available
+            timeout = 0 if len(batches) else DEFAULT_TIMEOUT
+            readable, _, xlist = select.select([self.__sock], [], [self.__sock], timeout)
+            if len(readable) and not len(xlist):
+                self.__recv_into_buffer()
+            elif len(batches):
+                return batches[0] if len(batches) == 1 else serialize.np.concatenate(batches)
+            else: # Effectively a timeout of DEFAULT_TIMEOUT seconds
+                _log.warning('no data received in last %d seconds ',DEFAULT_TIMEOUT)
+                return None
+        raise RTDEException(' _recv_batch() Connection lost ')
+
+    def __recv_into_buffer(self):
+        if self.__buf_start == self.__buf_end:
+            self.__buf_start = self.__buf_end = 0
+        elif self.__buf_end == len(self.__buf):
+            self.__make_room()
+        received = self.__sock.recv_into(self.__view[self.__buf_end:])
+        #When the controller stops while the script is running
+        if received == 0:
+            _log.error('received 0 bytes from Controller, probable cause: Controller has stopped')
+            self.__trigger_disconnected()  
+            raise RTDEException('received 0 bytes from Controller')
+
+        self.__buf_end += received
+
+    def __make_room(self):
+        """Moves unread data to the front of the receive buffer, growing it when full of unread data"""
+        pending = self.__buf_end - self.__buf_start
+        if self.__buf_start == 0:
+            buf = bytearray(2 * len(self.__buf))
+            buf[:pending] = self.__view[:pending]
+            self.__buf = buf
+            self.__view = memoryview(buf)
+        else:
+            self.__buf[:pending] = bytes(self.__view[self.__buf_start:self.__buf_end])
+        self.__buf_start = 0
+        self.__buf_end = pending
+
     def __trigger_disconnected(self):
         _log.info("RTDE disconnected")
         self.disconnect() #clean-up
@@ -344,11 +597,13 @@ class RTDE(object):
         result = serialize.ReturnValue.unpack(payload)
         return result.success
 
-    def __unpack_data_package(self, payload, output_config):
+    def __unpack_data_package(self, payload, output_config, offset=0):
         if output_config is None:
             _log.error('RTDE_DATA_PACKAGE: Missing output configuration')
             return None
-        output = output_config.unpack(payload)
+        output = output_config.unpack(payload, offset, self.__output_object)
+        if self.__reuse_output:
+            self.__output_object = output
         return output
 
     def __list_equals(self, l1, l2):
@@ -363,3 +618,45 @@ class RTDE(object):
     def skipped_package_count(self):
         """The skipped package count, resets on connect"""
         return self.__skipped_package_count
+
+    @property
+    def received_package_count(self):
+        """The data package count received from the controller, resets on connect"""
+        return self.__received_package_count
+
+    @property
+    def sent_package_count(self):
+        """The input data package count sent to the controller, resets on connect"""
+        return self.__sent_package_count
+
+    @property
+    def coalesced_package_count(self):
+        """The input data packages flush() sent in another package's write, each saving a send syscall,
+        resets on connect"""
+        return self.__coalesced_package_count
+
+    @property
+    def suppressed_package_count(self):
+        """The input data packages not sent as unchanged, see suppress_unchanged(), resets on connect"""
+        return self.__suppressed_package_count
+
+    @property
+    def send_backlog(self):
+        """Bytes written but not yet taken by the kernel"""
+        return self.__outbound_bytes
+
+    @property
+    def backpressure(self):
+        """True while more than SEND_QUEUE_LIMIT bytes wait to be sent, hold back new writes"""
+        return self.__outbound_bytes > SEND_QUEUE_LIMIT
+
+    @property
+    def write_latency_histogram(self):
+        """[(upper bound in us, writes)] from a write until the kernel took all of it, the last bound
+        is None for the overflow, resets on connect"""
+        return list(zip(WRITE_LATENCY_BUCKETS_US + (None,), self.__write_latency))
+
+    @property
+    def consumed_package_count(self):
+        """The data package count returned by receive() and receive_batch(), resets on connect"""
+        return self.__consumed_package_count
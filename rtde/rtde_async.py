@@ -0,0 +1,256 @@
+# Copyright (c) 2016, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import asyncio
+import logging
+import socket
+import struct
+
+from . import serialize
+from .rtde import (LOGNAME, DEFAULT_TIMEOUT, Command, ConnectionState, RTDEException,
+                   RTDE_PROTOCOL_VERSION_1, RTDE_PROTOCOL_VERSION_2)
+
+_log = logging.getLogger(LOGNAME)
+
+
+class AsyncRTDE(object):
+    """asyncio counterpart of rtde.RTDE, so one event loop can drive many controllers.
+
+    Commands are coroutines with the same names and results as RTDE. Once started,
+    receive() is an async iterator over every data package:
+
+        async for state in con.receive():
+            ...
+    """
+    def __init__(self, hostname, port=30004, timeout=DEFAULT_TIMEOUT):
+        self.hostname = hostname
+        self.port = port
+        self.timeout = timeout
+        self.__conn_state = ConnectionState.DISCONNECTED
+        self.__reader = None
+        self.__writer = None
+        self.__output_config = None
+        self.__input_config = {}
+        self.__protocolVersion = RTDE_PROTOCOL_VERSION_1
+
+    async def connect(self):
+        if self.__writer:
+            return
+        self.__reader, self.__writer = await asyncio.wait_for(
+            asyncio.open_connection(self.hostname, self.port), self.timeout)
+        sock = self.__writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__conn_state = ConnectionState.CONNECTED
+        if not await self.negotiate_protocol_version():
+            raise RTDEException('Unable to negotiate protocol version')
+
+    async def disconnect(self):
+        if self.__writer:
+            self.__writer.close()
+            try:
+                await self.__writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self.__reader = None
+            self.__writer = None
+        self.__conn_state = ConnectionState.DISCONNECTED
+
+    def is_connected(self):
+        return self.__conn_state is not ConnectionState.DISCONNECTED
+
+    async def get_controller_version(self):
+        version = await self.__sendAndReceive(Command.RTDE_GET_URCONTROL_VERSION)
+        if version:
+            _log.info('Controller version: ' + str(version.major) + '.' + str(version.minor) + '.' + str(version.bugfix)+ '.' + str(version.build))
+            return version.major, version.minor, version.bugfix, version.build
+        return None, None, None, None
+
+    async def negotiate_protocol_version(self):
+        payload = struct.pack('>H', RTDE_PROTOCOL_VERSION_2)
+        success = await self.__sendAndReceive(Command.RTDE_REQUEST_PROTOCOL_VERSION, payload)
+        if success:
+            self.__protocolVersion = RTDE_PROTOCOL_VERSION_2
+        return success
+
+    async def send_input_setup(self, variables, types=[]):
+        payload = bytearray(','.join(variables), 'utf-8')
+        result = await self.__sendAndReceive(Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS, payload)
+        if len(types)!=0 and list(result.types) != list(types):
+            _log.error('Data type inconsistency for input setup: ' +
+                     str(types) + ' - ' +
+                     str(result.types))
+            return None
+        result.names = variables
+        self.__input_config[result.id] = result
+        return result.data_class(result.id)
+
+    async def send_output_setup(self, variables, types=[], frequency=125):
+        payload = struct.pack('>d', frequency) + (','.join(variables).encode('utf-8'))
+        result = await self.__sendAndReceive(Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS, payload)
+        if len(types)!=0 and list(result.types) != list(types):
+            _log.error('Data type inconsistency for output setup: ' +
+                     str(types) + ' - ' +
+                     str(result.types))
+            return False
+        result.names = variables
+        self.__output_config = result
+        return True
+
+    async def send_start(self):
+        success = await self.__sendAndReceive(Command.RTDE_CONTROL_PACKAGE_START)
+        if success:
+            _log.info('RTDE synchronization started')
+            self.__conn_state = ConnectionState.STARTED
+        else:
+            _log.error('RTDE synchronization failed to start')
+        return success
+
+    async def send_pause(self):
+        """Pause synchronization, must not run while receive() is being iterated"""
+        success = await self.__sendAndReceive(Command.RTDE_CONTROL_PACKAGE_PAUSE)
+        if success:
+            _log.info('RTDE synchronization paused')
+            self.__conn_state = ConnectionState.PAUSED
+        else:
+            _log.error('RTDE synchronization failed to pause')
+        return success
+
+    async def send(self, input_data):
+        if self.__conn_state != ConnectionState.STARTED:
+            _log.error('Cannot send when RTDE synchronization is inactive')
+            return
+        if not input_data.recipe_id in self.__input_config:
+            _log.error('Input configuration id not found: ' + str(input_data.recipe_id))
+            return
+        config = self.__input_config[input_data.recipe_id]
+        return await self.__sendall(Command.RTDE_DATA_PACKAGE, config.pack(input_data))
+
+    async def receive(self):
+        """Async iterator over every data package, ends on timeout or when synchronization stops"""
+        if self.__output_config is None:
+            raise RTDEException('Output configuration not initialized')
+        if self.__conn_state != ConnectionState.STARTED:
+            raise RTDEException('Cannot receive when RTDE synchronization is inactive')
+        while self.__conn_state == ConnectionState.STARTED:
+            packet = await self.__recv_packet()
+            if packet is None:
+                return
+            command, payload = packet
+            if command == Command.RTDE_DATA_PACKAGE:
+                yield self.__output_config.unpack(payload)
+            else:
+                self.__on_packet(command, payload)
+
+    async def __sendAndReceive(self, cmd, payload=b''):
+        if not await self.__sendall(cmd, payload):
+            return None
+        while self.is_connected():
+            packet = await self.__recv_packet()
+            if packet is None:
+                return None
+            command, reply = packet
+            if command == cmd:
+                return self.__on_packet(command, reply)
+            if command != Command.RTDE_DATA_PACKAGE:
+                self.__on_packet(command, reply)
+            _log.debug('skipping package(2)')
+        raise RTDEException(' _recv() Connection lost ')
+
+    async def __sendall(self, command, payload=b''):
+        if self.__writer is None:
+            _log.error('Unable to send: not connected to Robot')
+            return False
+        self.__writer.write(serialize.HEADER.pack(serialize.HEADER.size + len(payload), command) + payload)
+        try:
+            await asyncio.wait_for(self.__writer.drain(), self.timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            await self.__trigger_disconnected()
+            return False
+        return True
+
+    async def __recv_packet(self):
+        """Reads one packet as (command, payload), None on timeout before it started.
+        A timeout inside a packet loses the framing, the connection is dropped"""
+        header = await self.__read(serialize.HEADER.size)
+        if header is None:
+            _log.warning('no data received in last %s seconds ', self.timeout)
+            return None
+        size, command = serialize.HEADER.unpack(header)
+        payload = await self.__read(size - serialize.HEADER.size)
+        if payload is None:
+            _log.error('timed out inside a package of %d bytes', size)
+            await self.__trigger_disconnected()
+            raise RTDEException('timed out inside a package')
+        return command, payload
+
+    async def __read(self, size):
+        """Exactly size bytes, None on timeout with nothing consumed"""
+        try:
+            return await asyncio.wait_for(self.__reader.readexactly(size), self.timeout)
+        except asyncio.TimeoutError:
+            return None
+        except (asyncio.IncompleteReadError, ConnectionError):
+            _log.error('received 0 bytes from Controller, probable cause: Controller has stopped')
+            await self.__trigger_disconnected()
+            raise RTDEException('received 0 bytes from Controller')
+
+    async def __trigger_disconnected(self):
+        _log.info("RTDE disconnected")
+        await self.disconnect()
+
+    def __on_packet(self, cmd, payload):
+        if cmd in (Command.RTDE_REQUEST_PROTOCOL_VERSION, Command.RTDE_CONTROL_PACKAGE_START,
+                   Command.RTDE_CONTROL_PACKAGE_PAUSE):
+            if len(payload) != 1:
+                _log.error('Wrong payload size for command ' + str(cmd))
+                return None
+            return serialize.ReturnValue.unpack(payload).success
+        elif cmd == Command.RTDE_GET_URCONTROL_VERSION:
+            if len(payload) != 16:
+                _log.error('RTDE_GET_URCONTROL_VERSION: Wrong payload size')
+                return None
+            return serialize.ControlVersion.unpack(payload)
+        elif cmd == Command.RTDE_TEXT_MESSAGE:
+            if self.__protocolVersion == RTDE_PROTOCOL_VERSION_1:
+                msg = serialize.MessageV1.unpack(payload)
+            else:
+                msg = serialize.Message.unpack(payload)
+            if msg.level in (serialize.Message.EXCEPTION_MESSAGE, serialize.Message.ERROR_MESSAGE):
+                _log.error(msg.source + ': ' + msg.message)
+            elif msg.level == serialize.Message.WARNING_MESSAGE:
+                _log.warning(msg.source + ': ' + msg.message)
+            elif msg.level == serialize.Message.INFO_MESSAGE:
+                _log.info(msg.source + ': ' + msg.message)
+        elif cmd in (Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS, Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS):
+            if len(payload) < 1:
+                _log.error('Setup reply without payload for command ' + str(cmd))
+                return None
+            return serialize.DataConfig.unpack_recipe(payload)
+        elif cmd == Command.RTDE_DATA_PACKAGE:
+            if self.__output_config is None:
+                _log.error('RTDE_DATA_PACKAGE: Missing output configuration')
+                return None
+            return self.__output_config.unpack(payload)
+        else:
+            _log.error('Unknown package command: ' + str(cmd))
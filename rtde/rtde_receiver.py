@@ -0,0 +1,157 @@
+# Copyright (c) 2016, Universal Robots A/S,
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the Universal Robots A/S nor the names of its
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL UNIVERSAL ROBOTS A/S BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import collections
+import logging
+import threading
+import time
+
+from .rtde import LOGNAME, DEFAULT_TIMEOUT, RTDEException
+
+_log = logging.getLogger(LOGNAME)
+
+
+class RTDEReceiver(object):
+    """Drains a started RTDE connection on a background thread.
+
+    The thread keeps the latest data package in a slot, so a slow control loop
+    never stalls socket reads. When the connection records (RTDE.start_recording)
+    every package is also moved into a bounded queue, see take_recorded().
+    The connection must not receive on any other thread while this runs.
+    """
+    def __init__(self, con, maxlen=100000):
+        self.__con = con
+        self.__thread = None
+        self.__running = False
+        self.__cond = threading.Condition()
+        self.__latest = None
+        self.__latest_time = None
+        self.__sequence = 0
+        self.__consumed_sequence = 0
+        self.__connected = True
+        self.__queue = collections.deque(maxlen=maxlen)
+        self.__dropped_count = 0
+        self.__max_queue_depth = 0
+        self.__max_consumer_lag = 0.0
+        self.__max_missed = 0
+
+    def start(self):
+        if self.__thread is not None:
+            return
+        self.__running = True
+        self.__connected = True
+        self.__thread = threading.Thread(target=self.__run, name='rtde-receiver', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Stop the thread, the connection can be used directly again afterwards"""
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def is_alive(self):
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def receive(self, timeout=DEFAULT_TIMEOUT):
+        """Wait for a data package newer than the last one returned, None on timeout or connection loss"""
+        with self.__cond:
+            if not self.__cond.wait_for(lambda: self.__sequence != self.__consumed_sequence or not self.__connected,
+                                        timeout):
+                _log.warning('no data received in last %s seconds ', timeout)
+                return None
+            if self.__sequence == self.__consumed_sequence:
+                return None
+            missed = self.__sequence - self.__consumed_sequence - 1
+            self.__consumed_sequence = self.__sequence
+            state, received_time = self.__latest, self.__latest_time
+        lag = time.perf_counter() - received_time
+        if lag > self.__max_consumer_lag:
+            self.__max_consumer_lag = lag
+        if missed > self.__max_missed:
+            self.__max_missed = missed
+        return state
+
+    def take_recorded(self):
+        """Returns the (sequence, data) packages recorded since the last call"""
+        recorded = []
+        popleft = self.__queue.popleft
+        for _ in range(len(self.__queue)):
+            recorded.append(popleft())
+        return recorded
+
+    def __run(self):
+        con = self.__con
+        queue = self.__queue
+        try:
+            while self.__running:
+                state = con.receive()
+                if state is None:
+                    continue # timeout, already logged by the connection
+                for item in con.take_recorded():
+                    if len(queue) == queue.maxlen:
+                        self.__dropped_count += 1
+                    queue.append(item)
+                depth = len(queue)
+                if depth > self.__max_queue_depth:
+                    self.__max_queue_depth = depth
+                with self.__cond:
+                    self.__latest = state
+                    self.__latest_time = time.perf_counter()
+                    self.__sequence += 1
+                    self.__cond.notify_all()
+        except RTDEException as e:
+            _log.error('RTDE receiver stopped: ' + str(e))
+        finally:
+            with self.__cond:
+                self.__connected = con.is_connected()
+                if not self.__connected:
+                    self.__cond.notify_all()
+
+    @property
+    def connected(self):
+        return self.__connected
+
+    @property
+    def queue_depth(self):
+        """Recorded packages waiting in the queue"""
+        return len(self.__queue)
+
+    @property
+    def max_queue_depth(self):
+        return self.__max_queue_depth
+
+    @property
+    def dropped_count(self):
+        """Recorded packages dropped because the queue was full"""
+        return self.__dropped_count
+
+    @property
+    def max_consumer_lag(self):
+        """Longest time in seconds between a package arriving and receive() returning it"""
+        return self.__max_consumer_lag
+
+    @property
+    def max_missed(self):
+        """Most packages that arrived between two receive() calls and were never returned"""
+        return self.__max_missed
@@ -23,14 +23,21 @@
 
 import struct
 
+try:
+    import numpy as np
+except ImportError: # only needed for structured array decoding
+    np = None
+
+HEADER = struct.Struct('>HB')
+
 
 class ControlHeader(object):
     __slots__ = ['command', 'size',]
     
     @staticmethod
-    def unpack(buf):
+    def unpack(buf, offset=0):
         rmd = ControlHeader()
-        (rmd.size, rmd.command) = struct.unpack_from('>HB', buf)
+        (rmd.size, rmd.command) = HEADER.unpack_from(buf, offset)
         return rmd
 
 
@@ -158,8 +165,77 @@ class DataObject(object):
         return obj
 
 
+STRUCT_TYPES = {
+    'BOOL': '?',
+    'UINT8': 'B',
+    'INT32': 'i',
+    'UINT32': 'I',
+    'UINT64': 'Q',
+    'DOUBLE': 'd',
+    'VECTOR3D': 'ddd',
+    'VECTOR6D': 'dddddd',
+    'VECTOR6INT32': 'iiiiii',
+    'VECTOR6UINT32': 'IIIIII',
+}
+
+
+NUMPY_TYPES = {
+    'BOOL': '?',
+    'UINT8': 'u1',
+    'INT32': '>i4',
+    'UINT32': '>u4',
+    'UINT64': '>u8',
+    'DOUBLE': '>f8',
+    'VECTOR3D': ('>f8', (3,)),
+    'VECTOR6D': ('>f8', (6,)),
+    'VECTOR6INT32': ('>i4', (6,)),
+    'VECTOR6UINT32': ('>u4', (6,)),
+}
+
+
+def make_data_class(names, plan, class_name='DataObject'):
+    """Generates a class with a slot per recipe field and compiled pack/unpack helpers.
+
+    plan is the DataConfig field plan, (name, start, stop) into the unpacked tuple.
+    Instances behave like DataObject: fields are attributes, None until set.
+    """
+    for name in names:
+        if not name.isidentifier():
+            raise ValueError('Recipe field is not a valid attribute name: ' + name)
+    init = ['def __init__(self, recipe_id=None):', '    self.recipe_id = recipe_id']
+    unpack = ['def _unpack(cls, li):', '    self = cls.__new__(cls)', '    self.recipe_id = li[0]']
+    unpack_into = ['def _unpack_into(self, li):', '    self.recipe_id = li[0]']
+    values = ['self.recipe_id']
+    scalars = []
+    for name, start, stop in plan:
+        init.append('    self.%s = None' % name)
+        if stop is None:
+            unpack.append('    self.%s = li[%d]' % (name, start))
+            unpack_into.append('    self.%s = li[%d]' % (name, start))
+            values.append('self.%s' % name)
+            scalars.append('self.%s is None' % name)
+        else:
+            unpack.append('    self.%s = list(li[%d:%d])' % (name, start, stop))
+            unpack_into.append('    self.%s[:] = li[%d:%d]' % (name, start, stop))
+            values.append('*self.%s' % name)
+    unpack.append('    return self')
+    # struct packs None as False for BOOL, so unset scalars are caught here (unset vectors fail to unpack)
+    values = ['def _values(self):'] + (['    if %s:' % ' or '.join(scalars), '        raise ValueError()'] if scalars else []) + \
+             ['    return (%s,)' % ', '.join(values)]
+    source = '\n'.join(init + unpack + unpack_into + values) + '\n'
+    namespace = {}
+    exec(source, namespace)
+    return type(class_name, (object,), {
+        '__slots__': ('recipe_id',) + tuple(names),
+        '__init__': namespace['__init__'],
+        '_unpack': classmethod(namespace['_unpack']),
+        '_unpack_into': namespace['_unpack_into'],
+        '_values': namespace['_values'],
+    })
+
+
 class DataConfig(object):
-    __slots__ = ['id', 'names', 'types', 'fmt']
+    __slots__ = ['id', '_names', 'types', 'fmt', 'struct', '_plan', 'data_class']
     @staticmethod
     def unpack_recipe(buf):
         rmd = DataConfig();
@@ -191,13 +267,84 @@ class DataConfig(object):
                 raise ValueError('An input parameter is already in use.')
             else:
                 raise ValueError('Unknown data type: ' + i)
+        rmd.struct = struct.Struct(rmd.fmt)
+        rmd._names = None
+        rmd._plan = None
+        rmd.data_class = None
         return rmd
-        
+
+    @property
+    def names(self):
+        return self._names
+
+    @names.setter
+    def names(self, names):
+        """Setting the names compiles the field plan and data class used by pack and unpack"""
+        if len(names) != len(self.types):
+            raise ValueError('List sizes are not identical.')
+        # (name, start, stop) into the unpacked tuple, stop is None for scalars.
+        # struct already yields float/int/bool so no per field conversion is needed.
+        plan = []
+        offset = 1 # skip recipe id
+        for name, data_type in zip(names, self.types):
+            size = get_item_size(data_type)
+            plan.append((name, offset, offset + size if data_type.startswith('VECTOR') else None))
+            offset += size
+        self._names = names
+        self._plan = tuple(plan)
+        self.data_class = make_data_class(names, self._plan, 'DataObject_%d' % self.id)
+
     def pack(self, state):
-        l = state.pack(self.names, self.types)
-        return struct.pack(self.fmt, *l)
+        if type(state) is self.data_class:
+            try:
+                return self.struct.pack(*state._values())
+            except (TypeError, ValueError, struct.error):
+                pass # report uninitialized fields below
+        l = [] if state.recipe_id is None else [state.recipe_id]
+        for name, start, stop in self._plan:
+            value = getattr(state, name)
+            if value is None:
+                raise ValueError('Uninitialized parameter: ' + name)
+            if stop is None:
+                l.append(value)
+            else:
+                l.extend(value)
+        return self.struct.pack(*l)
 
-    def unpack(self, data):
-        li =  struct.unpack_from(self.fmt, data)
-        return DataObject.unpack(li, self.names, self.types)
-    
+    def unpack(self, data, offset=0, obj=None):
+        """Decodes a data package, into obj in place when given (vector lists are reused)"""
+        li = self.struct.unpack_from(data, offset)
+        if obj is None:
+            return self.data_class._unpack(li)
+        obj._unpack_into(li)
+        return obj
+
+    def dtype(self, offset=0):
+        """NumPy structured dtype of the payload, placed at offset in records of offset + payload bytes"""
+        if np is None:
+            raise ImportError('numpy is required for structured array decoding')
+        names = ['recipe_id'] + list(self.names)
+        formats = ['u1'] + [NUMPY_TYPES[t] for t in self.types]
+        offsets = []
+        for f in formats:
+            offsets.append(offset)
+            offset += np.dtype(f).itemsize
+        return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': offset})
+
+    def unpack_packets(self, buf, offset, end, command):
+        """Decodes the back to back packets (header + payload) of this recipe in buf[offset:end] into a structured array.
+
+        Stops at the first packet with another command or size, returns the array and the packets decoded.
+        """
+        packet_size = HEADER.size + self.struct.size
+        count = (end - offset) // packet_size
+        headers = np.frombuffer(buf, dtype=np.dtype({'names': ['size', 'command'], 'formats': ['>u2', 'u1'],
+                                                     'offsets': [0, 2], 'itemsize': packet_size}),
+                                count=count, offset=offset)
+        mismatch = (headers['size'] != packet_size) | (headers['command'] != command)
+        if mismatch.any():
+            count = int(mismatch.argmax())
+        packets = np.frombuffer(buf, dtype=self.dtype(HEADER.size), count=count, offset=offset)
+        batch = np.empty(count, dtype=self.dtype())
+        batch[:] = packets # copies by field position into the packed layout
+        return batch, count
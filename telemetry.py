@@ -0,0 +1,228 @@
+"""Streaming binary telemetry recording.
+
+A recording is a header, then chunks of fixed-width little-endian rows appended
+as samples arrive, then an index footer written on close:
+
+    b'URTLM1' | u32 header length | header JSON {"columns": [[name, struct code], ...]}
+    b'CHNK' | u32 rows | rows * row bytes            (repeated)
+    b'INDX' | u32 chunks | chunks * (u64 offset, u32 rows) | u64 index offset | b'TEND'
+
+Only one chunk is held in memory. A file cut short by a crash has no footer, the
+reader then walks the chunks and keeps every complete row.
+
+iter_recording() streams any recorded run (this format, a binary capture or a
+csv) as fixed-size NumPy or pandas chunks with only the columns asked for.
+"""
+import csv
+import json
+import os
+import struct
+import time
+
+MAGIC = b'URTLM1'
+CHUNK = b'CHNK'
+INDEX = b'INDX'
+END = b'TEND'
+
+_U32 = struct.Struct('<I')
+_CHUNK_HEADER = struct.Struct('<4sI')
+_INDEX_ENTRY = struct.Struct('<QI')
+_TRAILER = struct.Struct('<Q4s')
+
+CHUNK_ROWS = 65536
+
+NUMPY_CODES = {'d': '<f8', 'f': '<f4', 'i': '<i4', 'I': '<u4', 'q': '<i8', 'Q': '<u8', '?': '?', 'B': 'u1'}
+
+
+class TelemetryRecorder():
+    """Appends rows to a recording file with bounded memory"""
+    def __init__(self, filename: str, columns: list, chunk_rows: int = 1024, flush_interval: float = 1.0,
+                 fsync: bool = False):
+        """columns is a list of (name, struct code) e.g. [("x", "d"), ("print", "?")].
+        A chunk is written every chunk_rows rows or flush_interval seconds, whichever comes first"""
+        self.filename = filename
+        self.columns = [(name, code) for name, code in columns]
+        self.row = struct.Struct('<' + ''.join(code for _, code in self.columns))
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.rows = 0
+        self.__index = []
+        self.__buf = bytearray()
+        self.__pending = 0
+        self.__last_flush = time.monotonic()
+
+        self.__file = open(filename, 'wb')
+        header = json.dumps({"columns": self.columns}).encode('utf-8')
+        self.__file.write(MAGIC + _U32.pack(len(header)) + header)
+        self.__file.flush()
+
+    def append(self, *values):
+        """Append one row, values in column order"""
+        self.__buf += self.row.pack(*values)
+        self.__pending += 1
+        self.rows += 1
+        if self.__pending >= self.chunk_rows or time.monotonic() - self.__last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as a chunk"""
+        self.__last_flush = time.monotonic()
+        if not self.__pending:
+            return
+        self.__index.append((self.__file.tell(), self.__pending))
+        self.__file.write(_CHUNK_HEADER.pack(CHUNK, self.__pending))
+        self.__file.write(self.__buf)
+        self.__file.flush()
+        if self.fsync:
+            os.fsync(self.__file.fileno())
+        self.__buf = bytearray()
+        self.__pending = 0
+
+    def close(self):
+        """Flush and write the index footer"""
+        if self.__file.closed:
+            return
+        self.flush()
+        index_offset = self.__file.tell()
+        self.__file.write(INDEX + _U32.pack(len(self.__index)))
+        for entry in self.__index:
+            self.__file.write(_INDEX_ENTRY.pack(*entry))
+        self.__file.write(_TRAILER.pack(index_offset, END))
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TelemetryReader():
+    """Reads a recording, complete or cut short"""
+    def __init__(self, filename: str):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError('Not a telemetry recording: ' + filename)
+            header_len = _U32.unpack(f.read(_U32.size))[0]
+            header = json.loads(f.read(header_len).decode('utf-8'))
+            self.data_offset = f.tell()
+        self.columns = [(name, code) for name, code in header["columns"]]
+        self.names = [name for name, _ in self.columns]
+        self.row = struct.Struct('<' + ''.join(code for _, code in self.columns))
+        self.chunks = self.__read_index()
+        self.complete = self.chunks is not None
+        if self.chunks is None:
+            self.chunks = self.__scan()
+        self.rows = sum(rows for _, rows in self.chunks)
+
+    def __read_index(self):
+        """The footer index as [(offset, rows)], None when the file has no footer"""
+        size = os.path.getsize(self.filename)
+        if size < self.data_offset + _TRAILER.size:
+            return None
+        with open(self.filename, 'rb') as f:
+            f.seek(size - _TRAILER.size)
+            index_offset, end = _TRAILER.unpack(f.read(_TRAILER.size))
+            if end != END or not self.data_offset <= index_offset < size:
+                return None
+            f.seek(index_offset)
+            if f.read(len(INDEX)) != INDEX:
+                return None
+            count = _U32.unpack(f.read(_U32.size))[0]
+            return [_INDEX_ENTRY.unpack(f.read(_INDEX_ENTRY.size)) for _ in range(count)]
+
+    def __scan(self):
+        """Walks the chunks of a file without footer, keeping complete rows only"""
+        size = os.path.getsize(self.filename)
+        chunks = []
+        with open(self.filename, 'rb') as f:
+            offset = self.data_offset
+            while offset + _CHUNK_HEADER.size <= size:
+                f.seek(offset)
+                magic, rows = _CHUNK_HEADER.unpack(f.read(_CHUNK_HEADER.size))
+                if magic != CHUNK:
+                    break
+                rows = min(rows, (size - offset - _CHUNK_HEADER.size) // self.row.size)
+                if rows:
+                    chunks.append((offset, rows))
+                offset += _CHUNK_HEADER.size + rows * self.row.size
+        return chunks
+
+    def iter_rows(self):
+        """Yields rows as tuples, one chunk in memory at a time"""
+        with open(self.filename, 'rb') as f:
+            for offset, rows in self.chunks:
+                f.seek(offset + _CHUNK_HEADER.size)
+                yield from self.row.iter_unpack(f.read(rows * self.row.size))
+
+    def dtype(self):
+        import numpy as np
+        return np.dtype([(name, NUMPY_CODES[code]) for name, code in self.columns])
+
+    def iter_chunks(self, names=None, chunk_rows=CHUNK_ROWS):
+        """Yields NumPy structured arrays of chunk_rows rows (the last may be shorter) with the named columns,
+        all by default. One recorded chunk is read at a time"""
+        import numpy as np
+        from numpy.lib import recfunctions
+        from rtde.csv_reader import rechunk
+        names = list(dict.fromkeys(names)) if names else list(self.names)
+        for name in names:
+            if name not in self.names:
+                raise ValueError('Unknown column: ' + name)
+        dtype = self.dtype()
+
+        def chunks():
+            with open(self.filename, 'rb') as f:
+                for offset, rows in self.chunks:
+                    f.seek(offset + _CHUNK_HEADER.size)
+                    data = np.frombuffer(f.read(rows * self.row.size), dtype=dtype)
+                    yield recfunctions.repack_fields(data[names])
+        return rechunk(chunks(), chunk_rows)
+
+    def to_array(self):
+        """All rows as a NumPy structured array"""
+        import numpy as np
+        data = np.empty(self.rows, dtype=self.dtype())
+        row = 0
+        with open(self.filename, 'rb') as f:
+            for offset, rows in self.chunks:
+                f.seek(offset + _CHUNK_HEADER.size)
+                data[row:row + rows] = np.frombuffer(f.read(rows * self.row.size), dtype=self.dtype())
+                row += rows
+        return data
+
+    def to_csv(self, filename: str):
+        """Export to csv with a header row, streaming"""
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.names)
+            writer.writerows(self.iter_rows())
+
+
+def open_recording(filename: str):
+    """A reader for a recorded run: a telemetry recording (data.tlm), a binary capture (data.bin, see
+    rtde/csv_binary_writer.py) or a csv (data.csv, or rtde/csv_writer.py output)"""
+    with open(filename, 'rb') as f:
+        first = f.readline()
+    if first.startswith(MAGIC):
+        return TelemetryReader(filename)
+    delimiter = ',' if b',' in first else ' '
+    if filename.endswith('.csv'):
+        from rtde.csv_reader import CSVReader
+        with open(filename) as f:
+            return CSVReader(f, delimiter=delimiter)
+    from rtde.csv_binary_reader import CSVBinaryReader
+    with open(filename, 'rb') as f:
+        return CSVBinaryReader(f, delimiter=delimiter)
+
+
+def iter_recording(filename: str, names: list = None, chunk_rows: int = CHUNK_ROWS, dataframe: bool = False):
+    """Yields a recorded run in chunks of chunk_rows rows with only the named columns, in constant memory.
+    Chunks are NumPy structured arrays, or pandas DataFrames with dataframe set"""
+    chunks = open_recording(filename).iter_chunks(names, chunk_rows)
+    if not dataframe:
+        return chunks
+    import pandas as pd
+    return (pd.DataFrame(chunk) for chunk in chunks)
@@ -0,0 +1,98 @@
+"""rtde/csv_binary_writer.py logs read back with rtde/csv_binary_reader.py"""
+import os
+import struct
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from rtde import serialize
+from rtde.csv_binary_reader import CSVBinaryReader
+from rtde.csv_binary_writer import CSVBinaryWriter
+
+NAMES = ['timestamp', 'runtime_state', 'output_int_register_0', 'output_bit_register_64', 'actual_q',
+         'actual_digital_input_bits']
+TYPES = ['DOUBLE', 'UINT32', 'INT32', 'BOOL', 'VECTOR6D', 'UINT64']
+ROWS = 30
+
+
+def make_config():
+    config = serialize.DataConfig.unpack_recipe(struct.pack('>B', 1) + ','.join(TYPES).encode('utf-8'))
+    config.names = NAMES
+    return config
+
+
+def make_object(config, i):
+    obj = config.data_class(1)
+    obj.timestamp = i * 0.008
+    obj.runtime_state = 2 if i % 3 else 1
+    obj.output_int_register_0 = -i
+    obj.output_bit_register_64 = i % 2 == 1
+    obj.actual_q = [i + k / 8 for k in range(6)]
+    obj.actual_digital_input_bits = i << 40
+    return obj
+
+
+@pytest.fixture
+def capture(tmp_path):
+    """A log written a row, a payload and a batch of payloads at a time, cut short inside the last row"""
+    config = make_config()
+    # payloads as received, without the recipe id
+    payloads = [config.pack(make_object(config, i))[1:] for i in range(ROWS)]
+    filename = str(tmp_path / "data.bin")
+    with open(filename, 'wb') as f:
+        writer = CSVBinaryWriter(f, NAMES, TYPES)
+        writer.writeheader()
+        writer.writerow(make_object(config, 0))
+        writer.writerow(payloads[1])
+        writer.writerows(payloads[2:])
+        assert writer.row_size == len(payloads[0])
+        f.write(payloads[0][:5])
+    return filename
+
+
+def test_round_trip(capture):
+    config = make_config()
+    with open(capture, 'rb') as f:
+        reader = CSVBinaryReader(f)
+    assert reader.get_samples() == ROWS
+    for i in range(ROWS):
+        obj = make_object(config, i)
+        assert reader.timestamp[i] == obj.timestamp
+        assert reader.runtime_state[i] == obj.runtime_state
+        assert reader.output_int_register_0[i] == obj.output_int_register_0
+        assert reader.output_bit_register_64[i] == obj.output_bit_register_64
+        assert [reader.__dict__['actual_q_%d' % k][i] for k in range(6)] == obj.actual_q
+        assert reader.actual_digital_input_bits[i] == obj.actual_digital_input_bits
+    assert reader.output_bit_register_64.dtype == np.bool_
+
+
+def test_filter_running_program(capture):
+    with open(capture, 'rb') as f:
+        reader = CSVBinaryReader(f, filter_running_program=True)
+    running = [i for i in range(ROWS) if i % 3]
+    assert reader.get_samples() == len(running)
+    assert list(reader.output_int_register_0) == [-i for i in running]
+
+
+def test_iter_chunks(capture):
+    with open(capture, 'rb') as f:
+        reader = CSVBinaryReader(f)
+    chunks = list(reader.iter_chunks(['output_int_register_0', 'timestamp'], chunk_rows=8))
+    assert [len(chunk) for chunk in chunks] == [8, 8, 8, 6]
+    assert chunks[0].dtype.names == ('output_int_register_0', 'timestamp')
+    assert list(np.concatenate(chunks)['output_int_register_0']) == [-i for i in range(ROWS)]
+    with pytest.raises(ValueError):
+        next(reader.iter_chunks(['missing']))
+
+
+def test_writer_rejects_partial_payloads(tmp_path):
+    with open(tmp_path / "data.bin", 'wb') as f:
+        writer = CSVBinaryWriter(f, NAMES, TYPES)
+        with pytest.raises(ValueError):
+            writer.writerow(b'\x00' * (writer.row_size - 1))
+        with pytest.raises(ValueError):
+            writer.writerows([b'\x00' * writer.row_size, b'\x00'])
@@ -0,0 +1,63 @@
+"""rtde/csv_reader.py against the eager reader it replaced"""
+import csv
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rtde.csv_reader as csv_reader
+from rtde.csv_reader import CSVReader
+
+
+def eager_columns(filename, delimiter=' ', filter_running_program=False):
+    """The old CSVReader: every row read up front, columns as float arrays. It could not parse
+    True/False, those are compared to 'True' here"""
+    with open(filename) as f:
+        rows = list(csv.reader([line for line in f.readlines() if line.strip()], delimiter=delimiter))
+    header, data = rows[0], rows[1:]
+    if filter_running_program:
+        idx = header.index(csv_reader.runtime_state)
+        data = [row for row in data if row[idx] == csv_reader.runtime_state_running]
+    columns = {}
+    for i, name in enumerate(header):
+        values = [row[i] for row in data]
+        if data and data[0][i] in ('True', 'False'):
+            columns[name] = np.array([value == 'True' for value in values])
+        else:
+            columns[name] = np.array(list(map(float, values)))
+    return columns
+
+
+@pytest.fixture
+def recording(tmp_path):
+    filename = str(tmp_path / "run.csv")
+    with open(filename, 'w') as f:
+        f.write("timestamp runtime_state x print\n\n")
+        for i in range(5000):
+            f.write("%r %d %r %s\n" % (i * 0.008, 2 if i % 7 else 1, float(np.sin(i)) * 1e-3, i % 3 == 0))
+            if i % 1000 == 0:
+                f.write("\n")
+    return filename
+
+
+@pytest.mark.parametrize("filter_running_program", [False, True])
+def test_matches_eager_reader(recording, monkeypatch, filter_running_program):
+    monkeypatch.setattr(csv_reader, 'CHUNK_SIZE', 4096) # many chunk boundaries
+    expected = eager_columns(recording, filter_running_program=filter_running_program)
+    with open(recording) as f:
+        reader = CSVReader(f, filter_running_program=filter_running_program)
+    assert reader.get_samples() == len(expected['x'])
+    assert reader.get_header() == list(expected)
+    for name, column in expected.items():
+        value = getattr(reader, name)
+        assert value.dtype == column.dtype, name
+        np.testing.assert_array_equal(value, column)
+    assert reader.print.dtype == np.bool_
+
+    chunks = list(reader.iter_chunks(['x', 'print'], chunk_rows=1000))
+    assert [len(c) for c in chunks[:-1]] == [1000] * (len(chunks) - 1)
+    np.testing.assert_array_equal(np.concatenate(chunks)['x'], expected['x'])
+    np.testing.assert_array_equal(np.concatenate(chunks)['print'], expected['print'])
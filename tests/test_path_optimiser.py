@@ -0,0 +1,82 @@
+"""path_optimiser.py print orders against brute force"""
+import itertools
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import path_optimiser
+from cycle_sim import MotionModel, simulate
+from path_optimiser import flip, optimise_stack, order_prints, route_time
+from portmark import cartons_enum, generate_coords, print_coord_to_tasks, stack_tasks
+
+
+def side_tasks(stack_format, side="A"):
+    return print_coord_to_tasks(generate_coords(stack_format, side=side, perfect=True))
+
+
+def shuffled_rows(count, seed=3):
+    """count print rows at random heights and spans"""
+    rng = random.Random(seed)
+    tasks = []
+    for i in range(count):
+        x = sorted(rng.uniform(-0.4, 0.6) for _ in range(3))
+        tasks.append(('control', [1 + i % 2] + x + [rng.uniform(0.1, 1.2), 0.0, 0.05]))
+    return tasks
+
+
+def brute_force(tasks, model, start, end):
+    best = None
+    for order in itertools.permutations(tasks):
+        for directions in itertools.product((False, True), repeat=len(tasks)):
+            route = [flip(task) if d else task for task, d in zip(order, directions)]
+            seconds = route_time(route, model, start, end)
+            if best is None or seconds < best:
+                best = seconds
+    return best
+
+
+def rows(route):
+    """The rows of a route, whatever their direction"""
+    return sorted(tuple(args[1:]) for _, args in route)
+
+
+@pytest.mark.parametrize("tasks", [side_tasks(cartons_enum.chilled_large), shuffled_rows(5)],
+                         ids=["chilled_large", "shuffled"])
+def test_exact_matches_brute_force(tasks):
+    model = MotionModel()
+    route = order_prints(tasks, model, end=model.home)
+    assert rows(route) == rows(tasks)
+    assert route_time(route, model, model.home, model.home) == pytest.approx(
+        brute_force(tasks, model, model.home, model.home))
+
+
+def test_heuristic_route_is_valid_and_no_worse_than_given_order():
+    model = MotionModel()
+    tasks = shuffled_rows(path_optimiser.EXACT_ROWS + 4)
+    route = order_prints(tasks, model, end=model.home)
+    assert rows(route) == rows(tasks)
+    assert route_time(route, model, model.home, model.home) <= route_time(tasks, model, model.home, model.home)
+
+
+def test_heuristic_is_close_to_exact():
+    model = MotionModel()
+    tasks = shuffled_rows(7)
+    variants = [(task, flip(task)) for task in tasks]
+    exact = route_time(path_optimiser._exact(variants, model, model.home, model.home), model, model.home, model.home)
+    heuristic = route_time(path_optimiser._heuristic(variants, model, model.home, model.home), model,
+                           model.home, model.home)
+    assert exact <= heuristic + 1e-9 and heuristic <= 1.25 * exact
+
+
+@pytest.mark.parametrize("stack_format", list(cartons_enum), ids=lambda f: f.name)
+def test_optimised_stack_is_no_slower(stack_format):
+    model = MotionModel()
+    optimised = optimise_stack(stack_format, model)
+    default = stack_tasks(stack_format)
+    assert sorted(task[0] for task in optimised) == sorted(task[0] for task in default)
+    assert simulate(optimised, model).total <= simulate(default, model).total + 1e-9
@@ -0,0 +1,127 @@
+"""UR10_RTDE task state machine, driven with canned states and no connection"""
+import collections
+import contextlib
+import io
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from portmark import UR10_RTDE
+
+POSITIONS = ['input_double_register_0', 'input_double_register_1', 'input_double_register_2',
+             'input_double_register_3', 'input_double_register_6', 'input_double_register_9']
+
+
+class FakeRTDE():
+    """Keeps the NEXT TASK and CANCEL HOME values of every flush"""
+    def __init__(self, robo):
+        self.robo = robo
+        self.flushed = []
+
+    def mark(self, input_data):
+        return True
+
+    def flush(self):
+        self.flushed.append((self.robo.control.input_int_register_0, self.robo.home.input_bit_register_76))
+        return True
+
+
+def make_robot(tasks):
+    robo = object.__new__(UR10_RTDE)  # no connection needed
+    robo.name = None
+    robo.pipelined = False
+    robo.tasks = collections.deque(tasks)
+    robo.phase = UR10_RTDE.phases.ready
+    robo.bank = 0
+    robo.staged = None
+    robo.control = SimpleNamespace(input_int_register_0=0)
+    robo.home = SimpleNamespace(input_bit_register_76=0)
+    robo.internal = SimpleNamespace(input_bit_register_64=0, input_bit_register_65=0)
+    robo.banks = [(SimpleNamespace(), POSITIONS)]
+    robo.con = FakeRTDE(robo)
+    return robo
+
+
+def step(robo, current=0, active=False, done=False, homed=False, running=True):
+    """One package from the controller, then what process() does with it"""
+    robo.state = SimpleNamespace(output_int_register_0=current, output_bit_register_64=active,
+                                 output_bit_register_65=done, output_bit_register_67=homed,
+                                 output_bit_register_68=False, output_bit_register_74=running)
+    if robo.transition:
+        robo.advance()
+        robo.con.flush()
+
+
+def print_task(direction=1):
+    return ("control", [direction, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6])
+
+
+def run_quietly(fn, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+
+def home_while_printing(robo, acks_together):
+    step(robo)
+    assert robo.control.input_int_register_0 == 1
+    step(robo, current=1, active=True)
+    step(robo, current=1, active=True, running=False)
+    assert robo.restart(3)
+    assert robo.phase is UR10_RTDE.phases.control_and_home_sent
+    if acks_together:
+        # home ack first, then the control ack, as the controller reports both
+        step(robo, current=1, done=True, homed=True)
+        assert robo.con.flushed[-1] == (0, 0)
+        step(robo, homed=True)
+    else:
+        step(robo, current=1, done=True)
+        assert robo.con.flushed[-1] == (0, 1)
+        assert robo.phase is UR10_RTDE.phases.home_sent
+        step(robo, homed=True)
+    assert robo.home.input_bit_register_76 == 0
+    return robo
+
+
+def test_restart_home_keeps_pending_control_ack():
+    for acks_together in (True, False):
+        robo = make_robot([print_task(1), print_task(2)])
+        run_quietly(home_while_printing, robo, acks_together)
+        # the second task goes out once the controller is idle, not hung
+        assert robo.control.input_int_register_0 == 2
+        assert not robo.tasks
+        assert robo.phase is UR10_RTDE.phases.control_sent
+
+
+def test_restart_home_last_task_acked_before_done():
+    robo = make_robot([print_task(1)])
+    run_quietly(home_while_printing, robo, True)
+    assert not robo.tasks
+    assert robo.phase is UR10_RTDE.phases.ready
+    assert robo.con.flushed[-1] == (0, 0)
+
+
+def test_restart_home_when_idle():
+    robo = make_robot([])
+    robo.phase = UR10_RTDE.phases.ready
+    run_quietly(step, robo, 0, False, False, False, False)
+    assert run_quietly(robo.restart, 3)
+    assert robo.phase is UR10_RTDE.phases.home_sent
+    run_quietly(step, robo, 0, False, False, True)
+    assert robo.phase is UR10_RTDE.phases.ready
+    assert robo.home.input_bit_register_76 == 0
+
+
+def test_home_is_sent_before_its_ack_when_already_homed():
+    robo = make_robot([("home", [1]), ("gantry", [1, 0])])
+    robo.gantry = SimpleNamespace(input_bit_register_74=0, input_bit_register_75=0)
+    run_quietly(step, robo, 0, False, False, True)
+    # the request goes out with the gantry move, not acked against the HOMED read before it
+    assert robo.con.flushed == [(0, 1)]
+    assert robo.gantry.input_bit_register_74 == 1
+    assert robo.phase is UR10_RTDE.phases.home_sent
+    # no register changed, the next package still acks it
+    run_quietly(step, robo, 0, False, False, True)
+    assert robo.con.flushed[-1] == (0, 0)
+    assert robo.phase is UR10_RTDE.phases.ready
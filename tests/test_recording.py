@@ -0,0 +1,96 @@
+"""portmark.py recordings against mock_robot.py on loopback"""
+import contextlib
+import io
+import os
+import struct
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import mock_robot
+from rtde.rtde import Command
+from portmark import UR10_RTDE
+
+CONFIG_FILE = os.path.join(ROOT, 'portmark.xml')
+
+
+class RejectStartSession(mock_robot.Session):
+    """Refuses to start synchronization"""
+    def on_command(self, command, payload):
+        if command == Command.RTDE_CONTROL_PACKAGE_START:
+            self.send(command, struct.pack('>B', 0))
+            return
+        super().on_command(command, payload)
+
+
+class RejectStartServer(mock_robot.RTDEServer):
+    session_class = RejectStartSession
+
+
+@pytest.fixture
+def rejecting():
+    server = RejectStartServer(port=0).start()
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize("lossless", [False, True])
+def test_rejected_start_keeps_last_recording(rejecting, tmp_path, monkeypatch, lossless):
+    monkeypatch.chdir(tmp_path)
+    record_file = str(tmp_path / ("last.bin" if lossless else "last.tlm"))
+    with open(record_file, 'wb') as f:
+        f.write(b'last run')
+    robo = UR10_RTDE('127.0.0.1', rejecting.port, CONFIG_FILE, record=True, lossless=lossless,
+                     record_file=record_file)
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            with pytest.raises(SystemExit):
+                robo.process()
+        finally:
+            robo.wrap_process()
+    assert not robo.con.is_connected()
+    with open(record_file, 'rb') as f:
+        assert f.read() == b'last run'
+    assert not os.path.exists(tmp_path / "data.csv")
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_lossless_records_every_package(tmp_path, monkeypatch, threaded):
+    from portmark import stack_tasks, cartons_enum
+    from rtde.csv_binary_reader import CSVBinaryReader
+    monkeypatch.chdir(tmp_path)
+    server = mock_robot.RTDEServer(port=0, program=mock_robot.PortmarkProgram(speed=20)).start()
+    try:
+        robo = UR10_RTDE('127.0.0.1', server.port, CONFIG_FILE, record=True, lossless=True, threaded=threaded)
+        sequences = []
+        source = robo.receiver if threaded else robo.con
+        take_recorded = source.take_recorded
+
+        def take_and_check():
+            recorded = take_recorded()
+            sequences.extend(sequence for sequence, _ in recorded)
+            assert all(isinstance(payload, bytes) for _, payload in recorded)
+            return recorded
+        source.take_recorded = take_and_check
+        if threaded:
+            # a slow main thread, the receiver reads packages meanwhile
+            start = robo.receiver.start
+            robo.receiver.start = lambda: (start(), time.sleep(0.05))
+        for task in stack_tasks(cartons_enum.testing):
+            robo.add_task(task)
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                robo.process()
+            finally:
+                robo.wrap_process()
+    finally:
+        server.stop()
+    assert server.program.tasks_done == 5
+    received = robo.con.received_package_count
+    assert sequences == list(range(received))
+    with open("data.bin", 'rb') as f:
+        assert CSVBinaryReader(f).get_samples() == received
@@ -0,0 +1,63 @@
+"""robo_plotting.py path decimation"""
+import os
+import sys
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from robo_plotting import decimate, PathLOD
+
+
+def walk(count, seed=1):
+    return np.cumsum(np.random.default_rng(seed).normal(size=(count, 3)), axis=0)
+
+
+def test_short_paths_are_kept_whole():
+    position = walk(100)
+    assert list(decimate(position, budget=100)) == list(range(100))
+    assert list(decimate(position, budget=0)) == list(range(100))
+
+
+def test_keeps_ends_and_extremes():
+    position = walk(100000)
+    keep = decimate(position, budget=2000)
+    assert len(keep) <= 2000
+    assert list(keep) == sorted(set(keep))
+    assert keep[0] == 0 and keep[-1] == len(position) - 1
+    kept = position[keep]
+    assert (kept.min(axis=0) == position.min(axis=0)).all()
+    assert (kept.max(axis=0) == position.max(axis=0)).all()
+
+
+def test_keeps_print_transitions():
+    position = walk(100000)
+    prints = np.zeros(len(position), dtype=bool)
+    for start in range(1234, len(position), 9876):
+        prints[start:start + 500] = True
+    keep = set(decimate(position, prints, budget=2000))
+    switch = np.flatnonzero(prints[1:] != prints[:-1])
+    assert set(switch) <= keep and set(switch + 1) <= keep
+
+
+def test_zoom_decimates_the_span_in_view():
+    position = np.zeros((100000, 3))
+    position[:, 0] = np.arange(len(position))
+    position[:, 1] = np.sin(np.arange(len(position)) / 7)
+    prints = np.zeros(len(position), dtype=bool)
+    fig = plt.figure()
+    try:
+        ax = fig.add_subplot(projection='3d')
+        lod = PathLOD(ax, position, prints, budget=800)
+        assert len(lod.path.get_data_3d()[0]) <= 800
+        ax.set_xlim3d(1000, 2000)
+        x = lod.path.get_data_3d()[0]
+        assert x.min() >= 999 and x.max() <= 2001
+        # more detail in view than before the zoom
+        assert len(x) > 800 * 1000 / len(position)
+    finally:
+        plt.close(fig)
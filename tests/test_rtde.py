@@ -0,0 +1,166 @@
+"""RTDE send path against mock_robot.py on loopback"""
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import mock_robot
+import rtde.rtde as rtde
+import rtde.rtde_config as rtde_config
+
+CONFIG_FILE = os.path.join(ROOT, 'portmark.xml')
+
+
+class StuckSocket():
+    """Wraps the client socket, send takes nothing or fails"""
+    def __init__(self, sock, fail=False):
+        self.sock = sock
+        self.fail = fail
+
+    def send(self, buf):
+        if self.fail:
+            raise ConnectionResetError('reset by peer')
+        raise BlockingIOError()
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class OrderSession(mock_robot.Session):
+    """Keeps the recipe id of every input package, in arrival order"""
+    def on_command(self, command, payload):
+        if command == rtde.Command.RTDE_DATA_PACKAGE:
+            self.server.input_order.append(payload[0])
+        super().on_command(command, payload)
+
+
+class OrderServer(mock_robot.RTDEServer):
+    session_class = OrderSession
+
+    def __init__(self):
+        super().__init__(port=0)
+        self.input_order = []
+
+
+@pytest.fixture
+def server():
+    server = OrderServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def con(server):
+    conf = rtde_config.ConfigFile(CONFIG_FILE)
+    con = rtde.RTDE('127.0.0.1', server.port)
+    con.connect()
+    con.send_output_setup(*conf.get_recipe('state'))
+    control = con.send_input_setup(*conf.get_recipe('control'))
+    control.input_int_register_0 = 0
+    con.send_start()
+    yield con, control
+    con.disconnect()
+
+
+def wait_for_inputs(server, count):
+    deadline = time.time() + 1
+    while len(server.input_order) < count and time.time() < deadline:
+        time.sleep(0.01)
+    return len(server.input_order)
+
+
+def test_flush_sends_in_last_marked_order(server, con):
+    con, control = con
+    conf = rtde_config.ConfigFile(CONFIG_FILE)
+    con.send_pause()
+    positions = con.send_input_setup(*conf.get_recipe('positions'))
+    con.send_start()
+    for name in conf.get_recipe('positions')[0]:
+        setattr(positions, name, 0.5)
+    # NEXT TASK marked first, re-marked after the coordinates: it must still follow them
+    con.mark(control)
+    con.mark(positions)
+    control.input_int_register_0 = 1
+    con.mark(control)
+    assert con.flush()
+    con.receive()
+    wait_for_inputs(server, 2)
+    assert server.input_order == [positions.recipe_id, control.recipe_id]
+    assert con.sent_package_count == 2 and con.coalesced_package_count == 1
+    assert server.inputs['input_int_register_0'] == 1
+
+
+def test_failed_send_raises_connection_lost(con):
+    con, control = con
+    con._RTDE__sock = StuckSocket(con._RTDE__sock, fail=True)
+    assert not con.send(control)
+    assert not con.is_connected()
+    with pytest.raises(rtde.RTDEException):
+        con.receive()
+
+
+def test_failed_drain_raises_connection_lost(con):
+    con, control = con
+    sock = con._RTDE__sock
+    con._RTDE__sock = stuck = StuckSocket(sock)
+    assert con.send(control)
+    assert con.send_backlog
+    stuck.fail = True
+    with pytest.raises(rtde.RTDEException):
+        con.receive()
+    assert not con.is_connected()
+
+
+def test_partial_sends_do_not_time_out(con, monkeypatch):
+    con, control = con
+    sock = con._RTDE__sock
+    con._RTDE__sock = stuck = StuckSocket(sock)
+    assert con.send(control)
+    assert con.send(control)
+    # the first buffer has waited longer than the timeout, but the kernel just took bytes
+    clock = [time.perf_counter() + 2 * rtde.DEFAULT_TIMEOUT]
+    monkeypatch.setattr(rtde.time, 'perf_counter', lambda: clock[0])
+    stuck.send = lambda buf: 1
+    con.receive()
+    assert con.is_connected()
+    con._RTDE__sock = sock
+    con.receive()
+    assert con.is_connected() and not con.send_backlog
+
+
+def test_suppress_unchanged_skips_repeated_packages(server, con):
+    con, control = con
+    assert con.send(control) and con.send(control)
+    con.suppress_unchanged()
+    for value in (1, 1, 1, 2, 2):
+        control.input_int_register_0 = value
+        assert con.send(control)
+    # marked back to the last sent values before the flush
+    control.input_int_register_0 = 3
+    con.mark(control)
+    control.input_int_register_0 = 2
+    con.mark(control)
+    assert con.flush()
+    con.receive()
+    assert wait_for_inputs(server, 4) == 4
+    time.sleep(0.05)
+    assert len(server.input_order) == 4
+    assert con.sent_package_count == 4 and con.suppressed_package_count == 4
+    assert server.inputs['input_int_register_0'] == 2
+
+
+def test_suppress_unchanged_refresh_period(server, con, monkeypatch):
+    con, control = con
+    con.suppress_unchanged(refresh_period=0.5)
+    clock = [time.monotonic()]
+    monkeypatch.setattr(rtde.time, 'monotonic', lambda: clock[0])
+    assert con.send(control) and con.send(control)
+    clock[0] += 0.6
+    assert con.send(control) and con.send(control)
+    con.suppress_unchanged(False)
+    assert con.send(control)
+    assert con.sent_package_count == 3 and con.suppressed_package_count == 2
@@ -0,0 +1,72 @@
+"""rtde/rtde_async.py against mock_robot.py on loopback"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import mock_robot
+import rtde.rtde_config as rtde_config
+from rtde import serialize
+from rtde.rtde import Command, RTDEException
+from rtde.rtde_async import AsyncRTDE
+
+CONFIG_FILE = os.path.join(ROOT, 'portmark.xml')
+
+
+class StallSession(mock_robot.Session):
+    """Streams server.packages data packages, then the header of one more and nothing after it"""
+    def stream(self):
+        config = self.output_config
+        obj = self.output_object
+        for name, t in zip(config.names, config.types):
+            setattr(obj, name, mock_robot.DEFAULT_VALUES[t])
+        header = serialize.HEADER.pack(config.struct.size + 3, Command.RTDE_DATA_PACKAGE)
+        with self.send_lock:
+            self.conn.sendall((header + config.pack(obj)) * self.server.packages +
+                              (header if self.server.partial else b''))
+        self.streaming.wait()
+
+
+class StallServer(mock_robot.RTDEServer):
+    session_class = StallSession
+
+    def __init__(self, packages, partial):
+        super().__init__(port=0)
+        self.packages = packages
+        self.partial = partial
+
+
+async def receive_all(port):
+    con = AsyncRTDE('127.0.0.1', port, timeout=0.2)
+    await con.connect()
+    await con.send_output_setup(*rtde_config.ConfigFile(CONFIG_FILE).get_recipe('state'))
+    assert await con.send_start()
+    states = []
+    try:
+        async for state in con.receive():
+            states.append(state)
+    except RTDEException as e:
+        return states, con.is_connected(), e
+    connected = con.is_connected()
+    await con.disconnect()
+    return states, connected, None
+
+
+@pytest.mark.parametrize("partial", [False, True])
+def test_timeout_keeps_or_drops_framing(partial):
+    server = StallServer(3, partial).start()
+    try:
+        states, connected, error = asyncio.run(receive_all(server.port))
+    finally:
+        server.stop()
+    assert len(states) == 3
+    if partial:
+        # a header without its payload, the stream can not be resynchronised
+        assert isinstance(error, RTDEException) and not connected
+    else:
+        # a timeout between packages ends the iteration, the connection stays usable
+        assert error is None and connected
@@ -0,0 +1,163 @@
+"""RTDE receive path against canned packages from mock_robot.py on loopback"""
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import mock_robot
+import rtde.rtde as rtde
+from rtde import serialize
+
+NAMES = ['timestamp', 'output_int_register_0', 'output_bit_register_64', 'actual_q', 'actual_digital_input_bits']
+TYPES = ['DOUBLE', 'INT32', 'BOOL', 'VECTOR6D', 'UINT64']
+PACKAGES = 40
+
+
+def canned(i):
+    """Field values of package i"""
+    return {'timestamp': i * 0.008, 'output_int_register_0': -i, 'output_bit_register_64': i % 2 == 1,
+            'actual_q': [i + k / 8 for k in range(6)], 'actual_digital_input_bits': i << 40}
+
+
+def make_config():
+    config = serialize.DataConfig.unpack_recipe(struct.pack('>B', 1) + ','.join(TYPES).encode('utf-8'))
+    config.names = NAMES
+    return config
+
+
+def check(data, i):
+    for name, value in canned(i).items():
+        assert getattr(data, name) == value, name
+
+
+class BurstSession(mock_robot.Session):
+    """Streams a text message then PACKAGES canned packages,
+    in bursts of server.burst bytes that split headers and payloads"""
+    def stream(self):
+        config = self.output_config
+        obj = config.data_class(1)
+        header = serialize.HEADER.pack(config.struct.size + 3, rtde.Command.RTDE_DATA_PACKAGE)
+        text = struct.pack('>B4sB4sB', 4, b'note', 4, b'mock', serialize.Message.INFO_MESSAGE)
+        packets = [serialize.HEADER.pack(len(text) + 3, rtde.Command.RTDE_TEXT_MESSAGE) + text]
+        for i in range(PACKAGES):
+            for name, value in canned(i).items():
+                setattr(obj, name, value)
+            packets.append(header + config.pack(obj))
+        stream = b''.join(packets)
+        burst = self.server.burst
+        # receive() only parses after a read, so nothing may arrive along with the START reply
+        time.sleep(0.05)
+        for i in range(0, len(stream), burst):
+            if not self.streaming.is_set():
+                return
+            with self.send_lock:
+                self.conn.sendall(stream[i:i + burst])
+            time.sleep(0.0005)
+        self.streaming.wait()
+
+
+class BurstServer(mock_robot.RTDEServer):
+    session_class = BurstSession
+
+    def __init__(self, burst):
+        super().__init__(port=0)
+        self.burst = burst
+
+
+def connect(burst):
+    server = BurstServer(burst).start()
+    con = rtde.RTDE('127.0.0.1', server.port)
+    con.connect()
+    con.send_output_setup(NAMES, TYPES)
+    return server, con
+
+
+@pytest.mark.parametrize("buffer_size", [16, rtde.RECV_BUFFER_SIZE])
+@pytest.mark.parametrize("burst", [7, 100, 4096])
+def test_receive_decodes_split_packages(monkeypatch, burst, buffer_size):
+    # a buffer smaller than one package has to grow
+    monkeypatch.setattr(rtde, 'RECV_BUFFER_SIZE', buffer_size)
+    server, con = connect(burst)
+    try:
+        assert con.send_start()
+        last = -1
+        while last < PACKAGES - 1:
+            data = con.receive()
+            assert data is not None
+            i = -data.output_int_register_0
+            assert i > last
+            check(data, i)
+            last = i
+        assert con.received_package_count == PACKAGES
+        assert con.skipped_package_count + con.consumed_package_count == PACKAGES
+        assert con.is_connected()
+    finally:
+        con.disconnect()
+        server.stop()
+
+
+def test_receive_binary_returns_the_payload():
+    server, con = connect(4096)
+    try:
+        assert con.send_start()
+        config = make_config()
+        payload = None
+        while payload is None or config.unpack(b'\x01' + payload).output_int_register_0 != 1 - PACKAGES:
+            payload = con.receive(binary=True)
+            assert payload is not None
+        obj = config.data_class(1)
+        for name, value in canned(PACKAGES - 1).items():
+            setattr(obj, name, value)
+        assert b'\x01' + payload == config.pack(obj)
+    finally:
+        con.disconnect()
+        server.stop()
+
+
+@pytest.mark.parametrize("burst", [7, 100, 4096])
+def test_receive_batch_decodes_every_package(monkeypatch, burst):
+    monkeypatch.setattr(rtde, 'RECV_BUFFER_SIZE', 16)
+    server, con = connect(burst)
+    try:
+        assert con.send_start()
+        batches = []
+        while sum(len(batch) for batch in batches) < PACKAGES:
+            batch = con.receive_batch()
+            assert batch is not None
+            batches.append(batch)
+        batch = np.concatenate(batches)
+        assert con.received_package_count == PACKAGES and con.skipped_package_count == 0
+        assert list(batch['recipe_id']) == [1] * PACKAGES
+        for i, row in enumerate(batch):
+            for name, value in canned(i).items():
+                assert row[name].tolist() == value, name
+    finally:
+        con.disconnect()
+        server.stop()
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_recording_keeps_every_package(binary):
+    server, con = connect(7)
+    try:
+        con.start_recording(binary=binary)
+        assert con.send_start()
+        recorded = []
+        while len(recorded) < PACKAGES:
+            assert con.receive() is not None
+            recorded.extend(con.take_recorded())
+        assert con.stop_recording() == []
+        assert con.skipped_package_count == 0
+    finally:
+        con.disconnect()
+        server.stop()
+    assert [sequence for sequence, _ in recorded] == list(range(PACKAGES))
+    config = make_config()
+    for i, (_, data) in enumerate(recorded):
+        check(config.unpack(b'\x01' + data) if binary else data, i)
@@ -0,0 +1,89 @@
+"""telemetry.py recordings, complete and cut short"""
+import csv
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import telemetry
+from telemetry import TelemetryReader, TelemetryRecorder
+
+COLUMNS = [("t", "d"), ("x", "f"), ("task", "i"), ("bits", "Q"), ("print", "?")]
+ROWS = 30
+
+
+def row(i):
+    return (i * 0.008, i / 4, -i, i << 40, i % 2 == 1)
+
+
+def record(filename, rows=ROWS, chunk_rows=7):
+    with TelemetryRecorder(filename, COLUMNS, chunk_rows=chunk_rows, flush_interval=60) as recorder:
+        for i in range(rows):
+            recorder.append(*row(i))
+    return recorder
+
+
+def test_round_trip(tmp_path):
+    filename = str(tmp_path / "data.tlm")
+    assert record(filename).rows == ROWS
+    reader = TelemetryReader(filename)
+    assert reader.complete
+    assert reader.names == [name for name, _ in COLUMNS]
+    assert [rows for _, rows in reader.chunks] == [7, 7, 7, 7, 2]
+    assert list(reader.iter_rows()) == [row(i) for i in range(ROWS)]
+    data = reader.to_array()
+    assert data.dtype.names == tuple(reader.names)
+    assert [tuple(r) for r in data.tolist()] == [row(i) for i in range(ROWS)]
+
+
+def test_to_csv(tmp_path):
+    filename = str(tmp_path / "data.tlm")
+    record(filename)
+    TelemetryReader(filename).to_csv(str(tmp_path / "data.csv"))
+    with open(tmp_path / "data.csv", newline='') as f:
+        lines = list(csv.reader(f))
+    assert lines[0] == [name for name, _ in COLUMNS]
+    assert lines[1:] == [[str(v) for v in row(i)] for i in range(ROWS)]
+
+
+def test_cut_short_keeps_complete_rows(tmp_path):
+    filename = str(tmp_path / "data.tlm")
+    record(filename)
+    reader = TelemetryReader(filename)
+    last_offset, last_rows = reader.chunks[-1]
+    # drop the footer and the end of the last row
+    end = last_offset + telemetry._CHUNK_HEADER.size + last_rows * reader.row.size - 3
+    with open(filename, 'r+b') as f:
+        f.truncate(end)
+    reader = TelemetryReader(filename)
+    assert not reader.complete
+    assert reader.rows == ROWS - 1
+    assert list(reader.iter_rows()) == [row(i) for i in range(ROWS - 1)]
+
+
+def test_flushed_rows_are_readable_before_close(tmp_path):
+    filename = str(tmp_path / "data.tlm")
+    recorder = TelemetryRecorder(filename, COLUMNS, chunk_rows=1024, flush_interval=60)
+    try:
+        for i in range(5):
+            recorder.append(*row(i))
+        assert TelemetryReader(filename).rows == 0
+        recorder.flush()
+        recorder.append(*row(5))
+        reader = TelemetryReader(filename)
+        assert not reader.complete
+        assert list(reader.iter_rows()) == [row(i) for i in range(5)]
+    finally:
+        recorder.close()
+    assert TelemetryReader(filename).rows == 6
+
+
+def test_rejects_other_files(tmp_path):
+    filename = str(tmp_path / "data.tlm")
+    with open(filename, 'wb') as f:
+        f.write(b'timestamp x\n')
+    with pytest.raises(ValueError):
+        TelemetryReader(filename)